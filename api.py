@@ -1,9 +1,311 @@
+import asyncio
 import datetime
+import io
+import os
+import random
+import tempfile
+import threading
+import time
+import weakref
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from xml.etree import ElementTree
+
 import requests
-import xmltodict
+from requests.adapters import HTTPAdapter
 
 from exceptions import RequestError
 import logs
+from metrics import metrics
+from models import CurrencyRate
+from rates_cache import rates_cache
+
+MAX_WORKERS = 8
+DYNAMIC_MIN_DATES = 3
+
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = MAX_WORKERS) -> requests.Session:
+    '''
+    Возвращает общую для процесса HTTP-сессию.
+    Сессия переиспользует соединения с сервером (keep-alive),
+    пул рассчитан не менее чем на pool_size одновременных запросов.
+    Если запрошен пул больше текущего, адаптер сессии заменяется
+    адаптером с пулом нужного размера, иначе лишние соединения
+    закрывались бы после каждого запроса.
+    '''
+
+    global _session, _session_pool_size
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        if pool_size > _session_pool_size:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+            _session_pool_size = pool_size
+        return _session
+
+
+def _iter_elements(text: str, tag: str) -> Iterator[dict[str, str]]:
+    '''
+    Потоково разбирает ответ сервера и возвращает поля каждого
+    элемента tag в виде словаря. Разобранные элементы сразу
+    освобождаются.
+    '''
+
+    for _, elem in ElementTree.iterparse(
+        io.BytesIO(text.encode('utf-8')), events=('end',)
+    ):
+        if elem.tag.rpartition('}')[2] != tag:
+            continue
+        fields = {
+            child.tag.rpartition('}')[2]: (child.text or '').strip()
+            for child in elem
+        }
+        elem.clear()
+        yield fields
+
+
+def iter_rates(
+    text: str, codes: Iterable[str] | None = None
+) -> Iterator[CurrencyRate]:
+    '''
+    Потоково разбирает ответ метода GetCursOnDateXML.
+
+    Элементы ValuteCursOnDate обрабатываются по одному и сразу
+    освобождаются, поэтому дерево документа целиком в памяти
+    не строится.
+
+    Аргументы:
+        text: текст ответа сервера.
+        codes: коды валют, данные которых необходимо получить. Если
+            заданы, разбор прекращается, как только найдены все коды.
+
+    Возвращает:
+        Итератор записей CurrencyRate.
+    '''
+
+    wanted = set(codes) if codes is not None else None
+    if wanted == set():
+        return
+    for fields in _iter_elements(text, 'ValuteCursOnDate'):
+        if wanted is None:
+            yield CurrencyRate.from_cbr(fields)
+        elif fields.get('Vcode') in wanted:
+            wanted.discard(fields['Vcode'])
+            yield CurrencyRate.from_cbr(fields)
+            if not wanted:
+                return
+
+
+def _date_key(date: str) -> str:
+    '''Приводит дату к виду ДД.ММ.ГГГГ для поиска в rates_cache.'''
+
+    return datetime.datetime.strptime(date, '%d.%m.%Y').strftime('%d.%m.%Y')
+
+
+def _to_date(date: str) -> datetime.date:
+    '''Переводит дату ДД.ММ.ГГГГ в datetime.date.'''
+
+    return datetime.datetime.strptime(date, '%d.%m.%Y').date()
+
+
+def _parse_all(key: str, text: str) -> list[CurrencyRate]:
+    '''
+    Разбирает ответ сервера целиком и сохраняет полную таблицу
+    курсов в rates_cache.
+    '''
+
+    with logs.timed('parse', date=key):
+        rates_data = list(iter_rates(text))
+    rates_cache.put(key, rates_data, complete=True)
+    logs.logger.info('Ответ сервера расшифрован')
+    return rates_data
+
+
+def _parse_required(
+    key: str, text: str, codes: list[str]
+) -> list[CurrencyRate] | bool:
+    '''
+    Разбирает ответ сервера до тех пор, пока не найдены все коды,
+    и сохраняет разобранные курсы в rates_cache. Если не все коды
+    найдены, документ разобран до конца, и в rates_cache сохраняется
+    полная таблица, чтобы отсутствие кодов за дату в следующий раз
+    определялось без запроса к API.
+    '''
+
+    wanted = set(codes)
+    rates = []
+    with logs.timed('parse', date=key):
+        for rate in iter_rates(text):
+            rates.append(rate)
+            wanted.discard(rate.numeric_code)
+            if not wanted:
+                break
+    rates_cache.put(key, rates, complete=bool(wanted))
+    return _select_currencies(rates, codes)
+
+
+def _select_currencies(
+    rates: Iterable[CurrencyRate], codes: list[str]
+) -> list[CurrencyRate] | bool:
+    '''
+    Отбирает данные запрошенных валют и логирует коды,
+    которых среди них нет.
+    '''
+
+    currency_list = [rate for rate in rates if rate.numeric_code in codes]
+    found_codes = [item.numeric_code for item in currency_list]
+    not_found_list = [code for code in codes if code not in found_codes]
+    if not_found_list != []:
+        logs.logger.warning(
+            'Данные коды не являются кодами валют: %s', not_found_list
+        )
+    if currency_list == []:
+        logs.logger.warning('Заданы несуществующие коды валют.')
+        return False
+    return currency_list
+
+
+class ResponseCache:
+    '''
+    Дисковый кэш ответов API ЦБ РФ, ключом которого является дата
+    запроса On_date.
+
+    Кэшируются только прошедшие даты: опубликованные за них курсы
+    не меняются. Каждый ответ хранится в отдельном файле в каталоге
+    _cache_dir. Время записи ответа хранится во времени изменения
+    файла (mtime), время последнего обращения - во времени доступа
+    (atime). Если файлов больше _max_entries, удаляются те,
+    к которым дольше всего не обращались, пока их не останется
+    _evict_ratio от _max_entries. Число файлов считывается с диска
+    один раз и далее ведется в памяти, поэтому каталог просматривается
+    только при удалении записей. Если задан _max_age, записи старше
+    _max_age секунд с момента записи считаются устаревшими.
+
+    Методы:
+        get,
+        set,
+        clear.
+    '''
+
+    _cache_dir = 'cache'
+    _max_entries = 5000
+    _evict_ratio = 0.9
+    _max_age = None
+
+    def __init__(self) -> None:
+        self._counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, date: str) -> str:
+        return os.path.join(self._cache_dir, f'{date[:10]}.xml')
+
+    def get(self, date: str) -> str | None:
+        '''
+        Возвращает сохраненный ответ сервера.
+
+        Аргументы:
+            date: дата запроса в формате ГГГГ-ММ-ДДTЧЧ:ММ:СС.
+
+        Возвращает:
+            Текст ответа или None, если записи нет или она устарела.
+        '''
+
+        path = self._path(date)
+        try:
+            now = time.time()
+            written = os.stat(path).st_mtime
+            if self._max_age is not None and now - written > self._max_age:
+                os.remove(path)
+                self._count(-1)
+                metrics.inc('response_cache_misses')
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(path, (now, written))
+        except OSError:
+            metrics.inc('response_cache_misses')
+            return None
+        metrics.inc('response_cache_hits')
+        logs.logger.info('Ответ за %s загружен из кэша', date[:10])
+        return text
+
+    def set(self, date: str, text: str) -> None:
+        '''
+        Сохраняет ответ сервера, если дата запроса уже прошла,
+        и удаляет лишние записи.
+
+        Аргументы:
+            date: дата запроса в формате ГГГГ-ММ-ДДTЧЧ:ММ:СС.
+            text: текст ответа сервера.
+        '''
+
+        if date[:10] >= datetime.date.today().isoformat():
+            return
+        try:
+            os.makedirs(self._cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=self._cache_dir, delete=False
+            ) as f:
+                f.write(text)
+            path = self._path(date)
+            is_new = not os.path.exists(path)
+            os.replace(f.name, path)
+            if is_new and self._count(1) > self._max_entries:
+                self._evict()
+        except OSError as e:
+            logs.logger.warning('Не удалось сохранить ответ в кэш: %s', e)
+
+    def _count(self, change: int) -> int:
+        '''
+        Изменяет на change число файлов в каталоге кэша и возвращает
+        его. При первом обращении к каталогу файлы пересчитываются.
+        '''
+
+        with self._lock:
+            count = self._counts.get(self._cache_dir)
+            if count is None:
+                count = sum(
+                    1 for entry in os.scandir(self._cache_dir)
+                    if entry.name.endswith('.xml')
+                )
+            else:
+                count += change
+            self._counts[self._cache_dir] = count
+            return count
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = [
+                entry for entry in os.scandir(self._cache_dir)
+                if entry.name.endswith('.xml')
+            ]
+            keep = max(int(self._max_entries * self._evict_ratio), 1)
+            entries.sort(key=lambda entry: entry.stat().st_atime)
+            removed = 0
+            for entry in entries[:max(len(entries) - keep, 0)]:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass
+            self._counts[self._cache_dir] = len(entries) - removed
+
+    def clear(self) -> None:
+        '''Удаляет все записи кэша.'''
+
+        self._counts.pop(self._cache_dir, None)
+        if not os.path.isdir(self._cache_dir):
+            return
+        for entry in os.scandir(self._cache_dir):
+            if entry.name.endswith('.xml'):
+                os.remove(entry.path)
 
 
 class ApiGetAndParse:
@@ -11,27 +313,41 @@ class ApiGetAndParse:
     Класс для получения и работы с данными о курсах валют, предоставленными
     API ЦБ РФ.
     Реализует метод GetCursOnDateXML.
+    Адрес API можно заменить переменной окружения CBR_API_URL,
+    например, на адрес локального mock_cbr.
 
     Переменные:
         date:str - строка с датой, за которую необходимо запросить курсы
         в формате ДД.ММ.ГГГГ.
+        use_cache:bool - использовать ли дисковый кэш ответов и таблицы
+        курсов в rates_cache.
 
     Методы:
         get_rates_data,
+        get_latest_date,
+        get_rates_text,
         parse_rates_data,
         get_required_currencies.
     '''
 
-    def __init__(self, date: str) -> None:
-        self.date = str(
-            datetime.datetime.strptime(date, "%d.%m.%Y")
-        ).replace(' ', 'T')
+    _cache = ResponseCache()
+
+    def __init__(self, date: str, use_cache: bool = True) -> None:
+        on_date = datetime.datetime.strptime(date, "%d.%m.%Y")
+        self.date = str(on_date).replace(' ', 'T')
+        self.use_cache = use_cache
+        self._key = on_date.strftime('%d.%m.%Y')
 
-    __url = 'https://www.cbr.ru/DailyInfoWebServ/DailyInfo.asmx?WSDL'
+    _timeout = (3.05, 30)
+    _retries = 3
+    _backoff = 0.5
+
+    _url = os.environ.get(
+        'CBR_API_URL',
+        'https://www.cbr.ru/DailyInfoWebServ/DailyInfo.asmx?WSDL'
+    )
     __headers = {
-            'Host': 'www.cbr.ru',
             'Content-Type': 'application/soap+xml; charset=utf-8',
-            'Content-Length': '1000',
     }
     __body = '''<?xml version="1.0" encoding="utf-8"?>
     <soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">
@@ -41,10 +357,20 @@ class ApiGetAndParse:
         </GetCursOnDateXML>
     </soap12:Body>
     </soap12:Envelope>'''
+    __latest_body = '''<?xml version="1.0" encoding="utf-8"?>
+    <soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">
+    <soap12:Body>
+        <GetLatestDateTime xmlns="http://web.cbr.ru/" />
+    </soap12:Body>
+    </soap12:Envelope>'''
 
     def get_rates_data(self) -> requests.Response:
         '''
         Получает от API данные о курсах валют за заданную дату.
+        Использует общую HTTP-сессию и таймауты _timeout
+        (на соединение и на чтение). При ошибке соединения или
+        коде ответа 5xx повторяет запрос до _retries раз с
+        экспоненциально растущей случайной паузой.
 
         Возвращает:
             requests.Response: объект Response
@@ -55,76 +381,517 @@ class ApiGetAndParse:
             или код ответа сервера != 200.
         '''
 
-        try:
-            response = requests.post(
-                url=self.__url,
-                headers=self.__headers,
-                data=self.__body.format(self.date)
-            )
-            logs.logger.info(
-                f'Получен ответ от сервера c кодом {response.status_code}'
+        return self._post(self.__body.format(self.date))
+
+    @classmethod
+    def get_latest_date(cls) -> str:
+        '''
+        Получает от API последнюю дату, на которую установлены
+        курсы валют (метод GetLatestDateTime).
+
+        Возвращает:
+            Дату в формате ДД.ММ.ГГГГ.
+
+        Исключения:
+            RequestError, если соединение с сервером невозможно
+            или код ответа сервера != 200.
+        '''
+
+        text = cls._post(cls.__latest_body).text
+        for _, elem in ElementTree.iterparse(
+            io.BytesIO(text.encode('utf-8')), events=('end',)
+        ):
+            if elem.tag.rpartition('}')[2] == 'GetLatestDateTimeResult':
+                latest = datetime.datetime.fromisoformat(elem.text.strip())
+                logs.logger.info('Последняя дата курсов ЦБ РФ: %s', latest)
+                return latest.strftime('%d.%m.%Y')
+        logs.logger.error('В ответе сервера нет даты GetLatestDateTime')
+        raise RequestError(None)
+
+    @classmethod
+    def _post(cls, body: str) -> requests.Response:
+        '''
+        Отправляет SOAP-запрос к API, повторяя его при ошибках
+        соединения и ответах с кодом 5xx.
+        '''
+
+        response = None
+        for attempt in range(cls._retries + 1):
+            start = time.perf_counter()
+            metrics.inc('http_requests')
+            try:
+                response = get_session().post(
+                    url=cls._url,
+                    headers=cls.__headers,
+                    data=body.encode('utf-8'),
+                    timeout=cls._timeout
+                )
+            except requests.exceptions.RequestException as e:
+                response = None
+                latency = (time.perf_counter() - start) * 1000
+                logs.logger.warning(
+                    'Ошибка соединения с сервером (%.0f мс): %s', latency, e
+                )
+            else:
+                latency = (time.perf_counter() - start) * 1000
+                logs.logger.info(
+                    'Получен ответ от сервера c кодом %s за %.0f мс',
+                    response.status_code, latency
+                )
+                if response.status_code < 500:
+                    break
+            if attempt < cls._retries:
+                metrics.inc('http_retries')
+                delay = random.uniform(0, cls._backoff * 2 ** attempt)
+                logs.logger.warning('Повторный запрос через %.2f с', delay)
+                time.sleep(delay)
+        if response is None:
+            metrics.inc('http_errors')
+            logs.logger.error('Невозможно установить соединение с сервером.')
+            raise RequestError(response)
+        if response.status_code != 200:
+            metrics.inc('http_errors')
+            logs.logger.error(
+                'Отказ сервера. Код ответа: %s', response.status_code
             )
-        except requests.exceptions.RequestException:
-            note = 'Невозможно установить соединение с сервером.'
-            note += f' Код ответа: {response.status_code}'
-            logs.logger.error(note)
             raise RequestError(response)
-        else:
-            if response.status_code != 200:
-                logs.logger.error(
-                    f'Отказ сервера. Код ответа: {response.status_code}'
-                )
-                raise RequestError(response)
-            return response
+        return response
+
+    def get_rates_text(self) -> str:
+        '''
+        Возвращает текст ответа сервера за заданную дату.
+        Если ответ есть в кэше, запрос к API не выполняется,
+        иначе полученный ответ сохраняется в кэш.
+        '''
+
+        if self.use_cache:
+            text = self._cache.get(self.date)
+            if text is not None:
+                return text
+        with logs.timed('fetch', date=self._key):
+            text = self.get_rates_data().text
+        if self.use_cache:
+            self._cache.set(self.date, text)
+        return text
 
-    def parse_rates_data(self) -> list[dict]:
+    def parse_rates_data(self) -> list[CurrencyRate]:
         '''
         Обрабатывает ответ сервера.
+        Если полная таблица курсов за заданную дату есть в rates_cache,
+        ответ сервера не запрашивается и не разбирается.
 
         Возвращает:
             Данные о курсах валют за заданную дату в формате
-            списка словарей.
-        '''
-
-        text = xmltodict.parse(self.get_rates_data().text)
-        rates_data = text.get(
-            'soap:Envelope'
-        ).get(
-            'soap:Body'
-        ).get(
-            'GetCursOnDateXMLResponse'
-        ).get(
-            'GetCursOnDateXMLResult'
-        ).get(
-            'ValuteData'
-        ).get(
-            'ValuteCursOnDate'
-        )
-        logs.logger.info('Ответ сервера расшифрован')
-        return rates_data
+            списка записей CurrencyRate.
+        '''
 
-    def get_required_currencies(self, codes: list[str]) -> list[dict] | bool:
+        if self.use_cache:
+            table = rates_cache.get(self._key)
+            if table is not None:
+                return list(table.values())
+        return _parse_all(self._key, self.get_rates_text())
+
+    def get_required_currencies(
+        self, codes: list[str]
+    ) -> list[CurrencyRate] | bool:
         '''
         Формирует список с данными запрошенных пользователем валют.
+        Если все коды есть в таблице курсов за заданную дату в
+        rates_cache, ответ сервера не запрашивается. Иначе разбор
+        ответа прекращается, как только найдены все коды.
 
         Аргументы:
             codes: список, содержащий запрошенные коды в виде строк.
 
         Возвращает:
-            Список словарей с данными о запрошенных валютах или False,
+            Список записей CurrencyRate о запрошенных валютах или False,
             если пользователь задал несуществующие коды валют.
         '''
 
-        currency_list = [
-            i for i in self.parse_rates_data() if i.get('Vcode') in codes
-        ]
-        found_codes = [item.get('Vcode') for item in currency_list]
-        not_found_list = [code for code in codes if code not in found_codes]
-        if not_found_list != []:
+        if self.use_cache:
+            table = rates_cache.get(self._key, codes)
+            if table is not None:
+                return _select_currencies(table.values(), codes)
+        return _parse_required(self._key, self.get_rates_text(), codes)
+
+
+class ApiCursDynamic:
+    '''
+    Класс для получения истории курсов валют за диапазон дат
+    одним запросом на валюту.
+    Реализует методы GetCursDynamicXML и EnumValutesXML.
+
+    Метод GetCursDynamicXML возвращает курсы только за даты, на которые
+    ЦБ РФ их устанавливал. Курс за остальные даты диапазона равен
+    последнему установленному, поэтому он переносится на них, но
+    не далее чем на _lookback дней: если ряд курсов обрывается
+    (например, валюта исключена из перечня), курсы за более поздние
+    даты не выдумываются. Чтобы курс был известен и на начало
+    диапазона, история запрашивается с запасом в _lookback дней.
+
+    Переменные:
+        start:str - начальная дата диапазона в формате ДД.ММ.ГГГГ.
+        end:str - конечная дата диапазона в формате ДД.ММ.ГГГГ.
+
+    Методы:
+        get_valutes,
+        get_dynamics,
+        get_required_currencies.
+    '''
+
+    _lookback = 14
+    _valutes = None
+    _valutes_lock = threading.Lock()
+
+    __enum_body = '''<?xml version="1.0" encoding="utf-8"?>
+    <soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">
+    <soap12:Body>
+        <EnumValutesXML xmlns="http://web.cbr.ru/">
+        <Seld>false</Seld>
+        </EnumValutesXML>
+    </soap12:Body>
+    </soap12:Envelope>'''
+    __body = '''<?xml version="1.0" encoding="utf-8"?>
+    <soap12:Envelope xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema" xmlns:soap12="http://www.w3.org/2003/05/soap-envelope">
+    <soap12:Body>
+        <GetCursDynamicXML xmlns="http://web.cbr.ru/">
+        <FromDate>{}</FromDate>
+        <ToDate>{}</ToDate>
+        <ValutaCode>{}</ValutaCode>
+        </GetCursDynamicXML>
+    </soap12:Body>
+    </soap12:Envelope>'''
+
+    def __init__(self, start: str, end: str) -> None:
+        self.start = start
+        self.end = end
+        self._start = _to_date(start)
+        self._end = _to_date(end)
+
+    @classmethod
+    def get_valutes(cls) -> dict[str, dict[str, str]]:
+        '''
+        Возвращает справочник ежедневно котируемых валют. Справочник
+        запрашивается у API один раз за время работы процесса.
+
+        Возвращает:
+            Словарь, где ключ - числовой код валюты, значение - поля
+            элемента EnumValutes (внутренний код Vcode, Vname,
+            VcharCode и др.).
+
+        Исключения:
+            RequestError, если соединение с сервером невозможно
+            или код ответа сервера != 200.
+        '''
+
+        with cls._valutes_lock:
+            if cls._valutes is None:
+                text = ApiGetAndParse._post(cls.__enum_body).text
+                cls._valutes = {
+                    fields['VnumCode'].lstrip('0'): fields
+                    for fields in _iter_elements(text, 'EnumValutes')
+                    if fields.get('VnumCode')
+                }
+                logs.logger.info(
+                    'Получен справочник валют: %s', len(cls._valutes)
+                )
+            return cls._valutes
+
+    def get_dynamics(self, code: str) -> dict[str, CurrencyRate]:
+        '''
+        Получает от API курсы одной валюты за каждую дату диапазона.
+
+        Аргументы:
+            code: числовой код валюты.
+
+        Возвращает:
+            Словарь, где ключ - дата в формате ДД.ММ.ГГГГ, значение -
+            запись CurrencyRate. Пустой словарь, если код не является
+            кодом валюты.
+
+        Исключения:
+            RequestError, если соединение с сервером невозможно
+            или код ответа сервера != 200.
+        '''
+
+        valute = self.get_valutes().get(code)
+        if valute is None:
             logs.logger.warning(
-                f'Данные коды не являются кодами валют: {not_found_list}'
+                'Данный код не является кодом валюты: %s', code
             )
-        if currency_list == []:
-            logs.logger.warning('Заданы несуществующие коды валют.')
+            return {}
+        from_date = self._start - datetime.timedelta(days=self._lookback)
+        with logs.timed('fetch', code=code):
+            text = ApiGetAndParse._post(self.__body.format(
+                f'{from_date.isoformat()}T00:00:00',
+                f'{self._end.isoformat()}T00:00:00',
+                valute['Vcode']
+            )).text
+        series = {
+            datetime.date.fromisoformat(fields['CursDate'][:10]):
+                CurrencyRate(
+                    name=valute['Vname'],
+                    numeric_code=code,
+                    alphabetic_code=valute['VcharCode'],
+                    scale=int(fields['Vnom']),
+                    rate=Decimal(fields['Vcurs'])
+                )
+            for fields in _iter_elements(text, 'ValuteCursDynamic')
+        }
+        rates = {}
+        current = None
+        for day, rate in sorted(series.items()):
+            if day >= self._start:
+                break
+            current = (day, rate)
+        limit = datetime.timedelta(days=self._lookback)
+        for i in range((self._end - self._start).days + 1):
+            day = self._start + datetime.timedelta(days=i)
+            if day in series:
+                current = (day, series[day])
+            if current is not None and day - current[0] <= limit:
+                rates[day.strftime('%d.%m.%Y')] = current[1]
+        logs.logger.info(
+            'Получена история курса %s за %s-%s: %s курсов',
+            code, self.start, self.end, len(series)
+        )
+        return rates
+
+    def get_required_currencies(
+        self, codes: list[str], max_workers: int = MAX_WORKERS
+    ) -> dict[str, list[CurrencyRate]]:
+        '''
+        Параллельно запрашивает историю курсов нескольких валют.
+        Запросы выполняются пулом не более чем из max_workers потоков,
+        по одному запросу на валюту.
+
+        Аргументы:
+            codes: список, содержащий запрошенные коды в виде строк.
+            max_workers: максимальное число одновременных запросов к API.
+
+        Возвращает:
+            Словарь, где ключ - дата в формате ДД.ММ.ГГГГ, значение -
+            список записей CurrencyRate о запрошенных валютах. Даты
+            упорядочены по возрастанию. Коды, историю которых получить
+            не удалось, в результат не попадают.
+
+        Исключения:
+            RequestError, если не удалось получить справочник валют.
+        '''
+
+        self.get_valutes()
+
+        def fetch(code: str) -> dict[str, CurrencyRate]:
+            try:
+                return self.get_dynamics(code)
+            except RequestError:
+                logs.logger.warning(
+                    'Не удалось получить историю курса: %s', code
+                )
+                return {}
+
+        rates: dict[str, list[CurrencyRate]] = {}
+        get_session(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for dynamics in executor.map(fetch, codes):
+                for date, rate in dynamics.items():
+                    rates.setdefault(date, []).append(rate)
+        return {date: rates[date] for date in sorted(rates, key=_to_date)}
+
+
+def get_required_currencies_on_dates(
+    dates: list[str],
+    codes: list[str] | None,
+    max_workers: int = MAX_WORKERS,
+    use_cache: bool = True
+) -> dict[str, list[CurrencyRate]]:
+    '''
+    Параллельно запрашивает данные о курсах валют за несколько дат.
+    Запросы выполняются пулом не более чем из max_workers потоков.
+
+    Если дат не меньше DYNAMIC_MIN_DATES и их больше, чем кодов,
+    курсы запрашиваются через ApiCursDynamic: по одному запросу на
+    валюту за весь диапазон вместо одного запроса на дату.
+
+    Аргументы:
+        dates: список дат в формате ДД.ММ.ГГГГ.
+        codes: список, содержащий запрошенные коды в виде строк.
+            Если None, запрашиваются курсы всех валют.
+        max_workers: максимальное число одновременных запросов к API.
+        use_cache: использовать ли дисковый кэш ответов.
+
+    Возвращает:
+        Словарь, где ключ - дата, значение - список записей CurrencyRate
+        о запрошенных валютах. Даты, за которые данные получить не
+        удалось, в словарь не попадают.
+    '''
+
+    def fetch(date: str) -> list[CurrencyRate] | bool:
+        try:
+            request = ApiGetAndParse(date, use_cache)
+            if codes is None:
+                return request.parse_rates_data()
+            return request.get_required_currencies(codes)
+        except RequestError:
             return False
-        return currency_list
+
+    if (
+        codes is not None
+        and len(dates) >= DYNAMIC_MIN_DATES
+        and len(set(codes)) < len(dates)
+    ):
+        ordered = sorted(dates, key=_to_date)
+        try:
+            dynamics = ApiCursDynamic(
+                ordered[0], ordered[-1]
+            ).get_required_currencies(list(dict.fromkeys(codes)), max_workers)
+        except RequestError:
+            dynamics = {}
+        rates = {date: dynamics[date] for date in dates if date in dynamics}
+    else:
+        get_session(max_workers)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(fetch, dates)
+            rates = {
+                date: currency_list
+                for date, currency_list in zip(dates, results)
+                if currency_list
+            }
+    failed = [date for date in dates if date not in rates]
+    if failed != []:
+        logs.logger.warning('Не удалось получить данные за даты: %s', failed)
+    return rates
+
+
+class AsyncApiGetAndParse:
+    '''
+    Асинхронный клиент API ЦБ РФ для одновременного запроса курсов
+    за много дат в одном цикле событий.
+
+    Запросы выполняются через ApiGetAndParse в потоках, поэтому
+    используют ту же HTTP-сессию, таймауты, повторы и дисковый кэш.
+    Одновременно выполняется не более max_concurrency запросов,
+    остальные ждут своей очереди, не занимая потоков. Ограничение
+    действует в каждом цикле событий отдельно, поэтому клиент можно
+    использовать в нескольких вызовах asyncio.run. Вызовы,
+    запрашивающие одну и ту же дату, пока запрос к ней выполняется,
+    получают результат этого запроса, а не создают новый.
+
+    Переменные:
+        max_concurrency:int - максимальное число одновременных запросов.
+        use_cache:bool - использовать ли дисковый кэш ответов и таблицы
+        курсов в rates_cache.
+
+    Методы:
+        get_rates_text,
+        parse_rates_data,
+        get_required_currencies,
+        get_required_currencies_on_dates.
+    '''
+
+    def __init__(
+        self, max_concurrency: int = MAX_WORKERS, use_cache: bool = True
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.use_cache = use_cache
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        get_session(max_concurrency)
+
+    async def _fetch(self, date: str) -> str:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        async with semaphore:
+            return await asyncio.to_thread(
+                ApiGetAndParse(date, self.use_cache).get_rates_text
+            )
+
+    async def get_rates_text(self, date: str) -> str:
+        '''
+        Возвращает текст ответа сервера за заданную дату.
+
+        Аргументы:
+            date: дата в формате ДД.ММ.ГГГГ.
+
+        Исключения:
+            RequestError, если соединение с сервером невозможно
+            или код ответа сервера != 200.
+        '''
+
+        key = _date_key(date)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._fetch(date))
+            self._in_flight[key] = future
+            future.add_done_callback(
+                lambda _: self._in_flight.pop(key, None)
+            )
+        return await asyncio.shield(future)
+
+    async def parse_rates_data(self, date: str) -> list[CurrencyRate]:
+        '''
+        Возвращает данные о курсах всех валют за заданную дату
+        в формате списка записей CurrencyRate.
+        '''
+
+        key = _date_key(date)
+        if self.use_cache:
+            table = rates_cache.get(key)
+            if table is not None:
+                return list(table.values())
+        text = await self.get_rates_text(date)
+        return await asyncio.to_thread(_parse_all, key, text)
+
+    async def get_required_currencies(
+        self, date: str, codes: list[str]
+    ) -> list[CurrencyRate] | bool:
+        '''
+        Формирует список с данными запрошенных валют за заданную дату.
+
+        Возвращает:
+            Список записей CurrencyRate о запрошенных валютах или False,
+            если заданы несуществующие коды валют.
+        '''
+
+        key = _date_key(date)
+        if self.use_cache:
+            table = rates_cache.get(key, codes)
+            if table is not None:
+                return _select_currencies(table.values(), codes)
+        text = await self.get_rates_text(date)
+        return await asyncio.to_thread(_parse_required, key, text, codes)
+
+    async def get_required_currencies_on_dates(
+        self, dates: list[str], codes: list[str]
+    ) -> dict[str, list[CurrencyRate]]:
+        '''
+        Одновременно запрашивает данные о курсах валют за несколько дат.
+
+        Возвращает:
+            Словарь, где ключ - дата, значение - список записей
+            CurrencyRate о запрошенных валютах. Даты, за которые данные
+            получить не удалось, в словарь не попадают.
+        '''
+
+        results = await asyncio.gather(
+            *(self.get_required_currencies(date, codes) for date in dates),
+            return_exceptions=True
+        )
+        rates = {}
+        for date, result in zip(dates, results):
+            if isinstance(result, RequestError) or not result:
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            rates[date] = result
+        failed = [date for date in dates if date not in rates]
+        if failed != []:
+            logs.logger.warning(
+                'Не удалось получить данные за даты: %s', failed
+            )
+        return rates
@@ -0,0 +1,251 @@
+import contextlib
+import datetime
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from unittest import mock
+
+import api
+import db
+import logs
+import main
+import mock_cbr
+from models import CurrencyRate
+from rates_cache import rates_cache
+import validation
+
+RECORDED = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'tests', 'example_response.txt'
+)
+OUTPUT = 'bench_results.json'
+START = datetime.date(2000, 1, 1)
+
+
+def _measure(func, repeat: int) -> list[float]:
+    '''Выполняет func repeat раз и возвращает время каждого запуска.'''
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _result(times: list[float], unit: str, work: int = 1, **params) -> dict:
+    '''
+    Сводит замеры в запись результата. Если unit оканчивается на /s,
+    value - пропускная способность по медианному времени, иначе
+    value - медианное время в unit.
+    '''
+
+    median = statistics.median(times)
+    if unit.endswith('/s'):
+        value = work / median
+    else:
+        value = median * {'s': 1, 'ms': 1e3, 'us': 1e6}[unit]
+    return {
+        'value': round(value, 3),
+        'unit': unit,
+        'median_s': median,
+        'min_s': min(times),
+        'repeat': len(times),
+        'params': params,
+    }
+
+
+def _date(i: int) -> str:
+    return (START + datetime.timedelta(days=i)).strftime('%d.%m.%Y')
+
+
+def synthetic_rates(count: int) -> list[CurrencyRate]:
+    return [
+        CurrencyRate(f'Валюта {i}', str(i + 1), f'C{i:02d}', 1,
+                     Decimal(f'{50 + i % 100}.{i:04d}'))
+        for i in range(count)
+    ]
+
+
+def bench_parse(texts: dict[str, str], repeat: int) -> dict:
+    '''Пропускная способность parse_rates_data, курсов в секунду.'''
+
+    results = {}
+    for name, text in texts.items():
+        request = api.ApiGetAndParse(_date(0), use_cache=False)
+        valutes = sum(1 for _ in api.iter_rates(text))
+        with mock.patch.object(
+            api.ApiGetAndParse, 'get_rates_text', return_value=text
+        ):
+            times = _measure(request.parse_rates_data, repeat)
+        results[f'parse.{name}'] = _result(
+            times, 'rates/s', valutes, valutes=valutes,
+            bytes=len(text.encode('utf-8'))
+        )
+    return results
+
+
+def bench_db(sizes: list[int], dates: int, repeat: int) -> dict:
+    '''
+    Скорость Inserter.insert_date + insert_rates, строк в секунду, и
+    задержка Reader.read при разном числе дат, уже внесенных в БД.
+    '''
+
+    results = {}
+    items = synthetic_rates(43)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(
+            db.BaseDb, '_db_name', os.path.join(tmp, 'bench.db')
+        ):
+            with db.close_manager():
+                bulk = db.BulkInserter()
+                bulk.insert({_date(i): items for i in range(size)})
+                offset = size
+
+                def insert():
+                    nonlocal offset
+                    for i in range(offset, offset + dates):
+                        inserter = db.Inserter(_date(i), items)
+                        inserter.insert_date()
+                        inserter.insert_rates()
+                    offset += dates
+
+                times = _measure(insert, repeat)
+                results[f'insert.db_{size}'] = _result(
+                    times, 'rows/s', dates * len(items),
+                    db_dates=size, dates=dates, rows_per_date=len(items)
+                )
+                reader = db.Reader()
+                probe = _date(offset // 2)
+                times = _measure(
+                    lambda: reader.read(probe).fetchall(), repeat * 10
+                )
+                results[f'read.db_{size}'] = _result(
+                    times, 'ms', db_dates=offset
+                )
+    return results
+
+
+def bench_main(text: str, dates: int, repeat: int) -> dict:
+    '''
+    Время работы main.main() от разбора аргументов до печати таблиц
+    с подмененным ответом сервера и пустой БД.
+    '''
+
+    codes = [rate.numeric_code for rate in api.iter_rates(text)]
+    argv = [
+        'main.py', f'{_date(0)}-{_date(dates - 1)}', ','.join(codes),
+        '--no-cache'
+    ]
+    response = mock.Mock(status_code=200, text=text)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+
+        def run():
+            rates_cache.clear()
+            if os.path.exists(path):
+                os.remove(path)
+            with (mock.patch.object(sys, 'argv', list(argv)),
+                  contextlib.redirect_stdout(io.StringIO())):
+                main.main()
+
+        with (mock.patch.object(db.BaseDb, '_db_name', path),
+              mock.patch('requests.Session.post', return_value=response)):
+            times = _measure(run, repeat)
+    return {'main.end_to_end': _result(
+        times, 's', dates=dates, codes=len(codes)
+    )}
+
+
+def run(quick: bool = False) -> dict:
+    '''
+    Выполняет все замеры без обращения к сети.
+
+    Аргументы:
+        quick: сократить число повторов и размеры БД.
+
+    Возвращает:
+        Словарь с описанием окружения (meta) и результатами замеров
+        (results), где ключ - имя замера.
+    '''
+
+    repeat = 3 if quick else 10
+    with open(RECORDED, 'r', encoding='utf-8') as f:
+        recorded = f.read()
+    texts = {
+        'recorded': recorded,
+        'synthetic_1000': mock_cbr.curs_on_date(
+            mock_cbr.synthetic_valutes(1000), START
+        ),
+    }
+    level = logs.logger.level
+    logs.logger.setLevel(logging.WARNING)
+    try:
+        results = bench_parse(texts, repeat * 10)
+        results.update(bench_db(
+            [0, 1000] if quick else [0, 1000, 10000], 50, repeat
+        ))
+        results.update(bench_main(recorded, 7 if quick else 30, repeat))
+    finally:
+        logs.logger.setLevel(level)
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': db.sqlite3.sqlite_version,
+            'quick': quick,
+        },
+        'results': results,
+    }
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    '''
+    Сравнивает результаты двух запусков. Для каждого общего замера
+    возвращает строку с отношением медианных времен нового запуска
+    к старому: значение больше 1 означает замедление.
+    '''
+
+    lines = []
+    for name, result in new['results'].items():
+        if name in old['results']:
+            ratio = result['median_s'] / old['results'][name]['median_s']
+            lines.append(f'{name:<24} x{ratio:.2f}')
+    return lines
+
+
+def main_bench():
+    '''
+    Запускает замеры и сохраняет результаты в JSON.
+    Необязательный аргумент командной строки - путь к файлу
+    результатов (по умолчанию bench_results.json).
+    Флаг --quick сокращает замеры, флаг --compare=ФАЙЛ сравнивает
+    результаты с сохраненными ранее.
+    '''
+
+    quick = validation.pop_flag('--quick')
+    baseline = None
+    for arg in list(sys.argv[1:]):
+        if arg.startswith('--compare='):
+            sys.argv.remove(arg)
+            baseline = arg.partition('=')[2]
+    output = sys.argv[1] if sys.argv[1:] else OUTPUT
+    report = run(quick)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    for name, result in report['results'].items():
+        print(f'{name:<24} {result["value"]:>14,.3f} {result["unit"]}')
+    if baseline is not None:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            print('\n'.join(compare(json.load(f), report)))
+
+
+if __name__ == '__main__':
+    main_bench()
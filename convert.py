@@ -0,0 +1,166 @@
+from collections.abc import Sequence
+from decimal import Decimal
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import db
+from exceptions import CurrencyNotFoundError
+from models import CurrencyRate
+
+RUBLE = CurrencyRate('Российский рубль', '643', 'RUB', 1, Decimal(1))
+
+
+class Converter:
+    '''
+    Класс для пересчета сумм из одной валюты в другую по курсам ЦБ РФ
+    за одну дату.
+
+    При создании курсы приводятся к стоимости одной единицы валюты
+    в рублях (rate / scale) и сохраняются в массив, индексируемый
+    числовым кодом валюты. Рубль (код 643) добавляется автоматически.
+
+    Пересчет выполняется в двух режимах:
+        точном - в Decimal с точностью текущего контекста decimal;
+        быстром - в float64, массивами numpy, если numpy установлен,
+            иначе поэлементно.
+
+    Переменные:
+        rates: list[CurrencyRate] - курсы валют за дату.
+
+    Методы:
+        load,
+        rate,
+        convert,
+        convert_many.
+    '''
+
+    def __init__(self, rates: list[CurrencyRate]) -> None:
+        self._index: dict[str, int] = {}
+        self._units: list[Decimal] = []
+        for rate in [RUBLE, *rates]:
+            self._index[rate.numeric_code] = len(self._units)
+            self._units.append(rate.rate / rate.scale)
+        if numpy is not None:
+            self._units_float = numpy.array(self._units, dtype=numpy.float64)
+        else:
+            self._units_float = [float(unit) for unit in self._units]
+
+    @classmethod
+    def load(cls, date: str) -> 'Converter':
+        '''
+        Создает конвертер по всем курсам за дату, внесенным в БД.
+
+        Аргументы:
+            date: дата в формате ДД.ММ.ГГГГ.
+        '''
+
+        reader = db.Reader()
+        try:
+            return cls(reader.get_rates(date))
+        finally:
+            reader.close()
+
+    def _position(self, code: str) -> int:
+        try:
+            return self._index[code]
+        except KeyError:
+            raise CurrencyNotFoundError(code)
+
+    def rate(self, from_code: str, to_code: str) -> Decimal:
+        '''
+        Возвращает кросс-курс: стоимость одной единицы валюты from_code
+        в валюте to_code.
+
+        Исключения:
+            CurrencyNotFoundError: вызывается, если курса одной из
+            валют нет.
+        '''
+
+        return (
+            self._units[self._position(from_code)]
+            / self._units[self._position(to_code)]
+        )
+
+    def convert(
+        self, amount: Decimal, from_code: str, to_code: str
+    ) -> Decimal:
+        '''
+        Точно пересчитывает сумму из валюты from_code в валюту to_code.
+
+        Исключения:
+            CurrencyNotFoundError: вызывается, если курса одной из
+            валют нет.
+        '''
+
+        return (
+            Decimal(amount) * self._units[self._position(from_code)]
+            / self._units[self._position(to_code)]
+        )
+
+    def convert_many(
+        self,
+        amounts: Sequence,
+        from_codes: str | Sequence[str],
+        to_codes: str | Sequence[str],
+        exact: bool = False
+    ):
+        '''
+        Пересчитывает массив сумм за один вызов.
+
+        Аргументы:
+            amounts: суммы.
+            from_codes: код исходной валюты для всех сумм или
+                последовательность кодов той же длины, что и amounts.
+            to_codes: код целевой валюты для всех сумм или
+                последовательность кодов той же длины, что и amounts.
+            exact: считать в Decimal вместо float64.
+
+        Возвращает:
+            В точном режиме - список Decimal. В быстром режиме -
+            numpy.ndarray типа float64, если numpy установлен,
+            иначе список float.
+
+        Исключения:
+            CurrencyNotFoundError: вызывается, если курса одной из
+            валют нет.
+        '''
+
+        from_positions = self._positions(from_codes, len(amounts))
+        to_positions = self._positions(to_codes, len(amounts))
+        if exact:
+            units = self._units
+            return [
+                Decimal(amount) * units[i] / units[j]
+                for amount, i, j in zip(amounts, from_positions, to_positions)
+            ]
+        units = self._units_float
+        if numpy is not None:
+            return (
+                numpy.asarray(amounts, dtype=numpy.float64)
+                * units[from_positions] / units[to_positions]
+            )
+        return [
+            float(amount) * units[i] / units[j]
+            for amount, i, j in zip(amounts, from_positions, to_positions)
+        ]
+
+    def _positions(self, codes: str | Sequence[str], size: int):
+        '''
+        Переводит коды валют в позиции массива курсов. Каждый
+        уникальный код ищется в словаре один раз.
+        '''
+
+        if isinstance(codes, str):
+            return [self._position(codes)] * size
+        if numpy is None:
+            return [self._position(code) for code in codes]
+        unique, inverse = numpy.unique(
+            numpy.asarray(codes, dtype=str), return_inverse=True
+        )
+        positions = numpy.array(
+            [self._position(str(code)) for code in unique], dtype=numpy.intp
+        )
+        return positions[inverse]
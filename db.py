@@ -1,7 +1,10 @@
+import os
 import sqlite3
+import threading
+from collections.abc import Iterator
 from contextlib import contextmanager
-
-import prettytable
+from decimal import Decimal
+from typing import TYPE_CHECKING
 
 from exceptions import (DbCheckError,
                         DbCreationError,
@@ -9,30 +12,372 @@ from exceptions import (DbCheckError,
                         DbRatesError,
                         DbReadError)
 import logs
+from metrics import metrics
+from models import CurrencyRate
+from rates_cache import rates_cache
+
+if TYPE_CHECKING:
+    import psycopg
+
+
+_MIGRATIONS = (
+    # 1: исходная схема.
+    '''
+    CREATE TABLE IF NOT EXISTS currency_orders
+        (id INTEGER PRIMARY KEY,
+        ondate TEXT);
+    CREATE TABLE IF NOT EXISTS currency_rates
+        (order_id INTEGER,
+        name TEXT NOT NULL,
+        numeric_code TEXT NOT NULL,
+        alphabetic_code TEXT NOT NULL,
+        scale INT NOT NULL,
+        rate TEXT NOT NULL,
+        FOREIGN KEY (order_id)
+        REFERENCES currency_order (id)
+            ON DELETE CASCADE);
+    ''',
+    # 2: уникальные индексы, исправленный внешний ключ и дата ГГГГ-ММ-ДД.
+    # Дубликаты дат и курсов, а также курсы без даты удаляются.
+    '''
+    CREATE TABLE currency_orders_new
+        (id INTEGER PRIMARY KEY,
+        ondate TEXT NOT NULL,
+        isodate TEXT NOT NULL);
+    INSERT INTO currency_orders_new (id, ondate, isodate)
+        SELECT MIN(id), ondate,
+               substr(ondate, 7, 4) || '-' || substr(ondate, 4, 2)
+               || '-' || substr(ondate, 1, 2)
+        FROM currency_orders
+        WHERE ondate IS NOT NULL
+        GROUP BY ondate;
+    CREATE TABLE currency_rates_new
+        (order_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        numeric_code TEXT NOT NULL,
+        alphabetic_code TEXT NOT NULL,
+        scale INT NOT NULL,
+        rate TEXT NOT NULL,
+        FOREIGN KEY (order_id)
+        REFERENCES currency_orders (id)
+            ON DELETE CASCADE);
+    CREATE UNIQUE INDEX idx_currency_rates_order_code
+        ON currency_rates_new (order_id, numeric_code);
+    INSERT OR IGNORE INTO currency_rates_new
+        SELECT currency_orders_new.id,
+               currency_rates.name,
+               currency_rates.numeric_code,
+               currency_rates.alphabetic_code,
+               currency_rates.scale,
+               currency_rates.rate
+        FROM currency_rates
+        JOIN currency_orders
+            ON currency_rates.order_id=currency_orders.id
+        JOIN currency_orders_new
+            ON currency_orders.ondate=currency_orders_new.ondate
+        ORDER BY currency_rates.rowid;
+    DROP TABLE currency_rates;
+    DROP TABLE currency_orders;
+    ALTER TABLE currency_orders_new RENAME TO currency_orders;
+    ALTER TABLE currency_rates_new RENAME TO currency_rates;
+    CREATE UNIQUE INDEX idx_currency_orders_ondate
+        ON currency_orders (ondate);
+    CREATE UNIQUE INDEX idx_currency_orders_isodate
+        ON currency_orders (isodate);
+    ''',
+)
+
+
+def to_iso(date: str) -> str:
+    '''Переводит дату из формата ДД.ММ.ГГГГ в формат ГГГГ-ММ-ДД.'''
+
+    return f'{date[6:10]}-{date[3:5]}-{date[0:2]}'
+
+
+def _statements(script: str) -> Iterator[str]:
+    '''Разбивает скрипт миграции на отдельные SQL-запросы.'''
+
+    statement = ''
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement
+            statement = ''
+
+
+def _migrate(con: sqlite3.Connection) -> None:
+    '''
+    Сверяет версию схемы базы (PRAGMA user_version) с числом миграций
+    в _MIGRATIONS и применяет недостающие.
+
+    Версия перечитывается после захвата блокировки записи (BEGIN
+    IMMEDIATE), поэтому процессы, одновременно открывшие базу
+    прежней версии, применяют каждую миграцию один раз.
+    '''
+
+    (version,) = con.execute('PRAGMA user_version').fetchone()
+    if version >= len(_MIGRATIONS):
+        return
+    con.execute('BEGIN IMMEDIATE')
+    try:
+        (version,) = con.execute('PRAGMA user_version').fetchone()
+        applied = []
+        for number, script in enumerate(_MIGRATIONS, start=1):
+            if number <= version:
+                continue
+            for statement in _statements(script):
+                con.execute(statement)
+            con.execute(f'PRAGMA user_version={number}')
+            applied.append(number)
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    for number in applied:
+        logs.logger.info('Схема БД обновлена до версии %s', number)
+
+
+class SqliteBackend:
+    '''
+    Хранилище курсов в файле SQLite, используется по умолчанию.
+
+    Подключение к файлу открывается один раз при первом обращении,
+    тогда же проверяется и при необходимости обновляется схема.
+    Все объекты BaseDb, работающие с одной базой, используют одно
+    подключение. Подключение закрывается, когда его освободили все
+    использовавшие его объекты, или при вызове close.
+
+    Подключение можно использовать из разных потоков, если они
+    не работают с ним одновременно.
+
+    Сразу после открытия к подключению применяются настройки
+    из _pragmas. По умолчанию включен журнал WAL, при котором
+    читающие процессы не блокируют пишущий и наоборот, а при
+    занятой базе подключение ждет до busy_timeout миллисекунд,
+    прежде чем вернуть ошибку database is locked.
+
+    Переменные:
+        errors:tuple - классы ошибок драйвера, которые BaseDb
+            переводит в исключения Db*Error.
+
+    Методы:
+        acquire,
+        release,
+        transaction,
+        insert_rates,
+        streaming_cursor,
+        close.
+    '''
+
+    errors = (sqlite3.Error,)
+    _pragmas = {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 268435456,
+    }
+
+    def __init__(self, path: str):
+        '''
+        Аргументы:
+            path - путь к файлу базы.
+        '''
+
+        self.path = path
+        self._con: sqlite3.Connection | None = None
+        self._users = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        '''
+        Возвращает подключение к базе, открывая его при необходимости.
+
+        Исключения:
+            sqlite3.Error: вызывается, если не удалось открыть базу
+            или обновить ее схему.
+        '''
+
+        with self._lock:
+            if self._con is None:
+                con = sqlite3.connect(self.path, check_same_thread=False)
+                try:
+                    for pragma, value in self._pragmas.items():
+                        con.execute(f'PRAGMA {pragma}={value}')
+                    _migrate(con)
+                except sqlite3.Error:
+                    con.close()
+                    raise
+                self._con = con
+            self._users += 1
+            return self._con
+
+    def release(self, con: sqlite3.Connection) -> None:
+        '''
+        Освобождает подключение к базе. Закрывает его, если больше
+        никто им не пользуется.
+        '''
+
+        with self._lock:
+            if con is not self._con:
+                return
+            self._users -= 1
+            if self._users == 0:
+                self._con.close()
+                self._con = None
+
+    def transaction(self, con: sqlite3.Connection) -> sqlite3.Connection:
+        '''
+        Возвращает менеджер контекста транзакции: при выходе без ошибок
+        она фиксируется, иначе откатывается.
+        '''
+
+        return con
+
+    def insert_rates(self, cur: sqlite3.Cursor, rows: list[tuple]) -> int:
+        '''
+        Вносит курсы через executemany.
+
+        Аргументы:
+            cur: курсор подключения.
+            rows: строки (order_id, name, numeric_code, alphabetic_code,
+                scale, rate).
+
+        Возвращает:
+            Число внесенных курсов.
+        '''
+
+        cur.executemany(_INSERT_RATES, rows)
+        return len(rows)
+
+    @contextmanager
+    def streaming_cursor(
+        self, con: sqlite3.Connection
+    ) -> Iterator[sqlite3.Cursor]:
+        '''
+        Менеджер контекста курсора для потокового чтения больших
+        выборок. Курсор sqlite3 и так считывает строки по мере
+        обращения к ним.
+        '''
+
+        cursor = con.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def close(self) -> None:
+        '''Закрывает подключение.'''
+
+        with self._lock:
+            if self._con is not None:
+                self._con.close()
+                self._con = None
+            self._users = 0
+
+
+def _postgres(url: str):
+    from postgres import PostgresBackend
+
+    return PostgresBackend(url)
+
+
+# Хранилища, выбираемые по схеме имени базы вида схема://...
+BACKENDS = {
+    'postgres': _postgres,
+    'postgresql': _postgres,
+}
+
+
+class ConnectionManager:
+    '''
+    Хранит общие для процесса хранилища курсов.
+
+    Хранилище создается при первом обращении к базе. Имя базы вида
+    схема://... выбирает хранилище по схеме из BACKENDS (например,
+    postgresql://user@host/dbname - PostgresBackend), любое другое
+    имя считается путем к файлу SQLite (SqliteBackend).
+
+    Хранилище предоставляет методы acquire и release (получение
+    и освобождение подключения), transaction (менеджер контекста
+    транзакции), insert_rates (пакетное внесение курсов),
+    streaming_cursor (курсор для потокового чтения) и close, а также
+    кортеж errors с классами ошибок драйвера.
+
+    Методы:
+        backend,
+        close_all.
+    '''
+
+    def __init__(self):
+        self._backends: dict = {}
+        self._lock = threading.Lock()
+
+    def backend(self, db_name: str):
+        '''
+        Возвращает хранилище базы db_name, создавая его при необходимости.
+
+        Исключения:
+            DbCreationError: вызывается, если схема имени базы
+            не найдена в BACKENDS.
+        '''
+
+        with self._lock:
+            backend = self._backends.get(db_name)
+            if backend is None:
+                scheme, separator, _ = db_name.partition('://')
+                if not separator:
+                    backend = SqliteBackend(db_name)
+                elif scheme in BACKENDS:
+                    backend = BACKENDS[scheme](db_name)
+                else:
+                    logs.logger.error(
+                        'Ошибка БД: неизвестный тип хранилища %s', scheme
+                    )
+                    raise DbCreationError
+                self._backends[db_name] = backend
+            return backend
+
+    def close_all(self) -> None:
+        '''Закрывает все открытые подключения.'''
+
+        with self._lock:
+            for backend in self._backends.values():
+                backend.close()
+            self._backends.clear()
+
+
+connections = ConnectionManager()
 
 
 class BaseDb:
     '''
     Базовый класс для работы с базой данных.
 
-    При инициализации проверяет наличие таблиц currency_orders
-    и currency_rates в базе. Если таблицы отсутствуют, создает их.
+    Получает подключение к базе _db_name у ее хранилища из менеджера
+    connections. По умолчанию это файл SQLite data.db, другую базу
+    можно задать переменной окружения CBR_DB_URL, например
+    postgresql://user@host/dbname. При первом подключении к базе
+    сверяет версию ее схемы с числом миграций хранилища и применяет
+    недостающие. Таким образом создаются таблицы currency_orders
+    и currency_rates в новой базе и обновляются таблицы в базе,
+    созданной прежней версией.
 
     Методы:
         close
     '''
 
-    _db_name = 'data.db'
+    _db_name = os.environ.get('CBR_DB_URL', 'data.db')
 
     def __init__(self):
         '''
-        Создает подлючение и курсор для работы с базой данных, проверяет
-        наличие и при необходимости создает таблицы.
+        Получает подлючение и создает курсор для работы с базой данных.
 
         Таблица currency_orders
             Поля:
                 id - первичный ключ
-                ondate - дата запроса
+                ondate - дата запроса в формате ДД.ММ.ГГГГ, уникальна
+                isodate - дата запроса в формате ГГГГ-ММ-ДД, уникальна
 
         Таблица currency_rates
             Поля:
@@ -43,51 +388,41 @@ class BaseDb:
                 scale - номинал валюты - INT
                 rate - курс номинала валюты к рублю - TEXT
             Все поля должны быть заполнены.
+            Пара (order_id, numeric_code) уникальна.
 
         Исключения:
             DbCreationError: вызывается, если не удалось создать
-            таблицы в базе данных.
+            или обновить таблицы в базе данных.
         '''
 
-        self._con = sqlite3.connect(self._db_name)
-        self._cur = self._con.cursor()
+        self._backend = connections.backend(self._db_name)
+        self._errors = self._backend.errors
         try:
-            query_orders = '''SELECT count(*) FROM sqlite_master
-                              WHERE type='table' AND name='currency_orders';'''
-            query_rates = '''SELECT count(*) FROM sqlite_master
-                             WHERE type='table' AND name='currency_rates';'''
-            with self._con:
-                (orders_exists,) = self._cur.execute(query_orders).fetchone()
-                (rates_exists,) = self._cur.execute(query_rates).fetchone()
-                if orders_exists == 0:
-                    query = ('''CREATE TABLE currency_orders
-                                (id INTEGER PRIMARY KEY,
-                                ondate TEXT)
-                        ''')
-                    self._cur.execute(query)
-                    logs.logger.info('Создана таблица currency_orders')
-                if rates_exists == 0:
-                    query = ('''CREATE TABLE if NOT EXISTS currency_rates
-                                (order_id INTEGER,
-                                name TEXT NOT NULL,
-                                numeric_code TEXT NOT NULL,
-                                alphabetic_code TEXT NOT NULL,
-                                scale INT NOT NULL,
-                                rate TEXT NOT NULL,
-                                FOREIGN KEY (order_id)
-                                REFERENCES currency_order (id)
-                                    ON DELETE CASCADE)
-                    ''')
-                    self._cur.execute(query)
-                    logs.logger.info('Создана таблица currency_rates')
-        except sqlite3.OperationalError as e:
-            logs.logger.error(f'Ошибка БД: создание таблиц {e}')
+            self._con = self._backend.acquire()
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: создание таблиц %s', e)
             raise DbCreationError
+        self._cur = self._con.cursor()
+        self._closed = False
 
     def close(self):
-        '''Закрывает соединение с БД.'''
-
-        self._con.close()
+        '''Освобождает подключение к БД.'''
+
+        if not self._closed:
+            self._closed = True
+            self._backend.release(self._con)
+
+
+_INSERT_RATES = '''
+    INSERT INTO currency_rates (
+        order_id,
+        name,
+        numeric_code,
+        alphabetic_code,
+        scale,
+        rate
+    ) VALUES (?,?,?,?,?,?)
+    '''
 
 
 class Inserter(BaseDb):
@@ -100,11 +435,11 @@ class Inserter(BaseDb):
         check_existing_rates
         insert_rates
     '''
-    def __init__(self, date: str, items: list[dict]):
+    def __init__(self, date: str, items: list[CurrencyRate]):
         '''
         Аргументы:
             date - дата, за которую получена информация.
-            items - данные о курсах валют.
+            items - данные о курсах валют в виде записей CurrencyRate.
         '''
 
         super().__init__()
@@ -131,21 +466,22 @@ class Inserter(BaseDb):
             self._cur.execute(query, (self.date,))
             (exists,) = self._cur.fetchone()
             if exists == 0:
-                query = '''INSERT INTO currency_orders (ondate) VALUES (?)'''
-                self._cur.execute(query, (self.date,))
+                query = '''INSERT INTO currency_orders (ondate, isodate)
+                           VALUES (?, ?)'''
+                self._cur.execute(query, (self.date, to_iso(self.date)))
                 self._con.commit()
                 done = True
-                logs.logger.info(f'Дата {self.date} внесена в БД')
+                logs.logger.info('Дата %s внесена в БД', self.date)
             else:
                 done = False
-                logs.logger.info(f'Дата {self.date} уже присутствует в БД')
-        except sqlite3.OperationalError as e:
-            logs.logger.error(f'Ошибка БД: внесение даты - {e}')
+                logs.logger.info('Дата %s уже присутствует в БД', self.date)
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: внесение даты - %s', e)
             raise DbDateError
         else:
             return done
 
-    def check_existing_rates(self) -> list[dict]:
+    def check_existing_rates(self) -> list[CurrencyRate]:
         '''
         Проверяет, присутствуют ли запрошенные данные в БД.
 
@@ -154,7 +490,7 @@ class Inserter(BaseDb):
         Если новых данных для внесения нет, логирует это.
 
         Возвращает:
-            Список словарей с данными, которых еще нет в БД
+            Список записей CurrencyRate, которых еще нет в БД
             или пустой список, если все запрошенные данные уже
             присутствуют в БД.
 
@@ -167,27 +503,28 @@ class Inserter(BaseDb):
             query = '''SELECT currency_rates.numeric_code
                        FROM currency_rates
                        JOIN currency_orders
-                       WHERE currency_orders.id=currency_rates.order_id
-                       AND currency_orders.ondate=?'''
+                           ON currency_orders.id=currency_rates.order_id
+                       WHERE currency_orders.ondate=?'''
             self._cur.execute(query, (self.date,))
             old_rates = [rate for (rate,) in self._cur.fetchall()]
             new_rates = [
-                i for i in self.items if i.get('Vcode') not in old_rates
+                i for i in self.items if i.numeric_code not in old_rates
             ]
             if old_rates != []:
                 trimmed_rates = [
-                    i['Vcode'] for i in self.items if i['Vcode'] in old_rates
+                    i.numeric_code for i in self.items
+                    if i.numeric_code in old_rates
                 ]
                 if trimmed_rates != []:
                     logs.logger.info(
-                        f'Курсы валют с кодами {trimmed_rates} уже есть в БД'
+                        'Курсы валют с кодами %s уже есть в БД', trimmed_rates
                     )
             if new_rates == []:
                 logs.logger.info('Не найдено новых данных для внесения')
             return new_rates
-        except sqlite3.OperationalError as e:
+        except self._errors as e:
             logs.logger.error(
-                f'Ошибка БД: проверка на наличие уже внесенных данных - {e}'
+                'Ошибка БД: проверка на наличие уже внесенных данных - %s', e
             )
             raise DbCheckError
 
@@ -200,50 +537,137 @@ class Inserter(BaseDb):
             False, если в запросе не было новых валют.
 
         Исключения:
-            DbRatesError: вызывается, если произошла ошибка БД.
+            DbRatesError: вызывается, если произошла ошибка БД или
+            дата не внесена в БД вызовом insert_date.
         '''
 
         try:
             to_insert = self.check_existing_rates()
             done = False
             if to_insert != []:
-                query = '''
-                    INSERT INTO currency_rates (
-                        order_id,
-                        name,
-                        numeric_code,
-                        alphabetic_code,
-                        scale,
-                        rate
-                    ) VALUES (
-                        (SELECT id FROM currency_orders WHERE ondate=?),
-                        ?,?,?,?,?)
-                    '''
-                for item in to_insert:
-                    self._cur.execute(query, (
-                        (self.date),
-                        item.get('Vname'),
-                        item.get('Vcode'),
-                        item.get('VchCode'),
-                        int(item.get('Vnom')),
-                        item.get('Vcurs')
-                    ))
-                self._con.commit()
+                query = '''SELECT id FROM currency_orders WHERE ondate=?'''
+                row = self._cur.execute(query, (self.date,)).fetchone()
+                if row is None:
+                    logs.logger.error(
+                        'Ошибка БД: дата %s не внесена в БД', self.date
+                    )
+                    raise DbRatesError
+                (order_id,) = row
+                with (logs.timed('insert', dates=1),
+                      self._backend.transaction(self._con)):
+                    self._cur.executemany(_INSERT_RATES, [
+                        (order_id, item.name, item.numeric_code,
+                         item.alphabetic_code, item.scale, str(item.rate))
+                        for item in to_insert
+                    ])
+                metrics.inc('rows_written', len(to_insert))
                 done = True
                 logs.logger.info('Данные о запрошенных курсах внесены в БД')
-        except sqlite3.OperationalError as e:
-            logs.logger.error(f'Ошибка БД: внесение курсов - {e}')
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: внесение курсов - %s', e)
             raise DbRatesError
         else:
             return done
 
 
+class BulkInserter(BaseDb):
+    '''
+    Класс для пакетного внесения в БД данных за много дат.
+    Наследует от BaseDb.
+
+    Даты вносятся через executemany, курсы - методом insert_rates
+    хранилища (в SQLite - через executemany, в PostgreSQL - командой
+    COPY), в одной транзакции на каждые _batch_dates дат.
+
+    Методы:
+        insert
+    '''
+
+    _batch_dates = 500
+
+    def __init__(self):
+        super().__init__()
+
+    def insert(self, rates: dict[str, list[CurrencyRate]]) -> int:
+        '''
+        Вносит в БД даты и курсы валют, которых там еще нет.
+
+        Аргументы:
+            rates: словарь, где ключ - дата, значение - список записей
+                CurrencyRate за эту дату.
+
+        Возвращает:
+            Число внесенных курсов.
+
+        Исключения:
+            DbRatesError: вызывается, если произошла ошибка БД.
+        '''
+
+        dates = list(rates)
+        inserted = 0
+        try:
+            for i in range(0, len(dates), self._batch_dates):
+                batch = dates[i:i + self._batch_dates]
+                with (logs.timed('insert', dates=len(batch)),
+                      self._backend.transaction(self._con)):
+                    inserted += self._insert_batch(
+                        {date: rates[date] for date in batch}
+                    )
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: пакетное внесение курсов - %s', e)
+            raise DbRatesError
+        metrics.inc('rows_written', inserted)
+        logs.logger.info('Внесено курсов: %s за %s дат', inserted, len(dates))
+        return inserted
+
+    def _insert_batch(self, rates: dict[str, list[CurrencyRate]]) -> int:
+        placeholders = ','.join('?' * len(rates))
+        self._cur.executemany(
+            '''INSERT INTO currency_orders (ondate, isodate)
+               VALUES (?, ?) ON CONFLICT DO NOTHING''',
+            [(date, to_iso(date)) for date in rates]
+        )
+        query = f'''SELECT ondate, id FROM currency_orders
+                    WHERE ondate IN ({placeholders})'''
+        order_ids = dict(self._cur.execute(query, list(rates)).fetchall())
+        ids = list(order_ids.values())
+        query = f'''SELECT order_id, numeric_code FROM currency_rates
+                    WHERE order_id IN ({placeholders})'''
+        existing = set(self._cur.execute(query, ids).fetchall())
+        rows = [
+            (order_ids[date], item.name, item.numeric_code,
+             item.alphabetic_code, item.scale, str(item.rate))
+            for date, items in rates.items()
+            for item in items
+            if (order_ids[date], item.numeric_code) not in existing
+        ]
+        return self._backend.insert_rates(self._cur, rows)
+
+
+# Индекс isodate просматривается с конца до первой даты с курсами,
+# поэтому время запроса не растет с историей.
+_LATEST_DATE = '''
+    SELECT ondate FROM currency_orders
+    WHERE EXISTS (
+        SELECT 1 FROM currency_rates
+        WHERE currency_rates.order_id=currency_orders.id
+    )
+    ORDER BY isodate DESC LIMIT 1
+    '''
+
+
 class Reader(BaseDb):
     '''
     Класс для чтения и печати данных из БД.
     Наследует от BaseDb.
 
     Методы:
+        get_stored_codes,
+        latest_date,
+        get_rates,
+        iter_range,
+        iter_chunks,
+        read_matrix,
         read,
         print.
     '''
@@ -251,7 +675,261 @@ class Reader(BaseDb):
     def __init__(self):
         super().__init__()
 
-    def read(self, date: str) -> sqlite3.Cursor:
+    def get_stored_codes(self, date: str, codes: list[str]) -> list[str]:
+        '''
+        Проверяет, какие из запрошенных кодов валют уже есть в БД
+        за заданную дату.
+
+        Аргументы:
+            date: дата, за которую необходимо проверить данные.
+            codes: список, содержащий запрошенные коды в виде строк.
+
+        Возвращает:
+            Список кодов, данные о которых уже внесены в БД.
+
+        Исключения:
+            DbCheckError: вызывается при ошибке БД.
+        '''
+
+        try:
+            query = '''SELECT currency_rates.numeric_code
+                       FROM currency_rates
+                       JOIN currency_orders
+                           ON currency_orders.id=currency_rates.order_id
+                       WHERE currency_orders.ondate=?'''
+            self._cur.execute(query, (date,))
+            stored = {code for (code,) in self._cur.fetchall()}
+            return [code for code in codes if code in stored]
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: проверка наличия курсов - %s', e)
+            raise DbCheckError
+
+    def latest_date(self) -> str | None:
+        '''
+        Возвращает последнюю дату, за которую в БД есть курсы.
+
+        Возвращает:
+            Дату в формате ДД.ММ.ГГГГ или None, если БД пуста.
+
+        Исключения:
+            DbReadError: вызывается при ошибке БД.
+        '''
+
+        try:
+            self._cur.execute(_LATEST_DATE)
+            row = self._cur.fetchone()
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: чтение последней даты - %s', e)
+            raise DbReadError
+        return row[0] if row is not None else None
+
+    def get_rates(
+        self, date: str, codes: list[str] | None = None
+    ) -> list[CurrencyRate]:
+        '''
+        Cчитывет из БД курсы валют за запрошенную дату.
+        Если заданы коды и все они есть в таблице курсов за дату
+        в rates_cache, БД не запрашивается. Считанные из БД курсы
+        добавляются в rates_cache.
+
+        Аргументы:
+            date: дата, за которую необходимо получить данные.
+            codes: коды валют. Если не заданы, считываются все
+                курсы за дату.
+
+        Возвращает:
+            Список записей CurrencyRate, упорядоченный по наименованию
+            валюты.
+
+        Исключения:
+            DbReadError: вызывается при ошибке БД.
+        '''
+
+        if codes is not None:
+            table = rates_cache.get(date, codes)
+            if table is not None:
+                return sorted(
+                    (table[code] for code in set(codes) if code in table),
+                    key=lambda rate: rate.name
+                )
+        try:
+            query = '''SELECT
+                        currency_rates.name,
+                        currency_rates.numeric_code,
+                        currency_rates.alphabetic_code,
+                        currency_rates.scale,
+                        currency_rates.rate
+                       FROM currency_rates
+                           INNER JOIN currency_orders
+                               ON currency_rates.order_id=currency_orders.id
+                                WHERE currency_orders.ondate=?
+                       ORDER BY currency_rates.name ASC'''
+            with logs.timed('read', date=date):
+                rates = [
+                    CurrencyRate(
+                        name, code, char_code, int(scale), Decimal(rate)
+                    )
+                    for name, code, char_code, scale, rate
+                    in self._cur.execute(query, (date,))
+                    if codes is None or code in codes
+                ]
+            rates_cache.put(date, rates)
+            logs.logger.info('Курсы за %s загружены из БД', date)
+            return rates
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: чтение данных - %s', e)
+            raise DbReadError
+
+    def iter_range(
+        self, start: str, end: str, codes: list[str] | None = None
+    ) -> Iterator[tuple[str, CurrencyRate]]:
+        '''
+        Потоково считывает из БД курсы валют за диапазон дат одним
+        запросом по индексу currency_orders.isodate.
+
+        Аргументы:
+            start: начальная дата диапазона в формате ДД.ММ.ГГГГ.
+            end: конечная дата диапазона в формате ДД.ММ.ГГГГ.
+            codes: коды валют. Если не заданы, считываются все курсы.
+
+        Возвращает:
+            Итератор пар (дата в формате ДД.ММ.ГГГГ, CurrencyRate),
+            упорядоченных по дате и коду валюты.
+
+        Исключения:
+            DbReadError: вызывается при ошибке БД.
+        '''
+
+        try:
+            with self._backend.streaming_cursor(self._con) as cursor:
+                self._select_range(cursor, 'ondate', start, end, codes)
+                for date, name, code, char_code, scale, rate in cursor:
+                    yield date, CurrencyRate(
+                        name, code, char_code, int(scale), Decimal(rate)
+                    )
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: чтение диапазона дат - %s', e)
+            raise DbReadError
+
+    def iter_chunks(
+        self,
+        start: str | None = None,
+        end: str | None = None,
+        codes: list[str] | None = None,
+        chunk_size: int = 10000
+    ) -> Iterator[list[tuple]]:
+        '''
+        Потоково считывает из БД курсы валют порциями фиксированного
+        размера, не преобразуя значения полей.
+
+        Аргументы:
+            start: начальная дата в формате ДД.ММ.ГГГГ. Если не задана,
+                диапазон не ограничен снизу.
+            end: конечная дата в формате ДД.ММ.ГГГГ. Если не задана,
+                диапазон не ограничен сверху.
+            codes: коды валют. Если не заданы, считываются все курсы.
+            chunk_size: число строк в порции.
+
+        Возвращает:
+            Итератор списков строк (isodate, name, numeric_code,
+            alphabetic_code, scale, rate), упорядоченных по дате
+            и коду валюты.
+
+        Исключения:
+            DbReadError: вызывается при ошибке БД.
+        '''
+
+        try:
+            with self._backend.streaming_cursor(self._con) as cursor:
+                self._select_range(cursor, 'isodate', start, end, codes)
+                while chunk := cursor.fetchmany(chunk_size):
+                    yield chunk
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: выгрузка курсов - %s', e)
+            raise DbReadError
+
+    def _select_range(
+        self,
+        cursor: 'sqlite3.Cursor | psycopg.ServerCursor',
+        date_column: str,
+        start: str | None,
+        end: str | None,
+        codes: list[str] | None
+    ) -> None:
+        query = f'''SELECT
+                    currency_orders.{date_column},
+                    currency_rates.name,
+                    currency_rates.numeric_code,
+                    currency_rates.alphabetic_code,
+                    currency_rates.scale,
+                    currency_rates.rate
+                   FROM currency_orders
+                       INNER JOIN currency_rates
+                           ON currency_rates.order_id=currency_orders.id
+                   WHERE currency_orders.isodate BETWEEN ? AND ?'''
+        params = [
+            to_iso(start) if start else '0000-00-00',
+            to_iso(end) if end else '9999-99-99',
+        ]
+        if codes is not None:
+            query += f'''
+                   AND currency_rates.numeric_code
+                       IN ({','.join('?' * len(codes))})'''
+            params += codes
+        query += '''
+                   ORDER BY currency_orders.isodate,
+                            currency_rates.numeric_code'''
+        cursor.execute(query, params)
+
+    def read_matrix(
+        self,
+        start: str,
+        end: str,
+        codes: list[str],
+        as_array: bool = False
+    ) -> tuple[list[str], list[str], list[list[Decimal | None]]]:
+        '''
+        Считывает курсы валют за диапазон дат в виде матрицы
+        дата x валюта.
+
+        Аргументы:
+            start: начальная дата диапазона в формате ДД.ММ.ГГГГ.
+            end: конечная дата диапазона в формате ДД.ММ.ГГГГ.
+            codes: коды валют, задают столбцы матрицы.
+            as_array: вернуть матрицу в виде numpy.ndarray типа float64,
+                где отсутствующие курсы равны nan. Требует numpy.
+
+        Возвращает:
+            Кортеж (даты, коды, матрица). Строки матрицы соответствуют
+            датам, за которые в БД есть хотя бы один из курсов, столбцы -
+            кодам. Значение - курс одной единицы валюты к рублю
+            (rate / scale) или None, если курса нет.
+
+        Исключения:
+            DbReadError: вызывается при ошибке БД.
+        '''
+
+        columns = {code: i for i, code in enumerate(codes)}
+        dates = []
+        matrix = []
+        for date, rate in self.iter_range(start, end, codes):
+            if not dates or dates[-1] != date:
+                dates.append(date)
+                matrix.append([None] * len(codes))
+            matrix[-1][columns[rate.numeric_code]] = rate.rate / rate.scale
+        logs.logger.info(
+            'Курсы за %s-%s загружены из БД: %s дат', start, end, len(dates)
+        )
+        if as_array:
+            import numpy
+            matrix = numpy.array(
+                [[float('nan') if value is None else float(value)
+                  for value in row] for row in matrix],
+                dtype=numpy.float64
+            ).reshape(len(dates), len(codes))
+        return dates, list(codes), matrix
+
+    def read(self, date: str) -> 'sqlite3.Cursor | psycopg.Cursor':
         '''
         Cчитывет данные из БД за запрошенную дату.
 
@@ -263,7 +941,7 @@ class Reader(BaseDb):
             date: дата, за которую необходимо получить данные.
 
         Возвращает:
-            sqlite3.Cursor с данными.
+            Курсор с данными.
 
         Исключения:
             DbReadError: вызывается при ошибке БД.
@@ -281,14 +959,17 @@ class Reader(BaseDb):
                                ON currency_rates.order_id=currency_orders.id
                                 WHERE currency_orders.ondate=?
                        ORDER BY currency_rates.name ASC'''
-            data = self._cur.execute(query, (date,))
-            logs.logger.info(f'Данные за {date} загружены из БД')
+            with logs.timed('read', date=date):
+                data = self._cur.execute(query, (date,))
+            logs.logger.info('Данные за %s загружены из БД', date)
             return data
-        except sqlite3.OperationalError as e:
-            logs.logger.error(f'Ошибка БД: чтение данных - {e}')
+        except self._errors as e:
+            logs.logger.error('Ошибка БД: чтение данных - %s', e)
             raise DbReadError
 
-    def print(self, to_print: sqlite3.Cursor) -> None:
+    def print(
+        self, to_print: 'sqlite3.Cursor | psycopg.Cursor'
+    ) -> None:
         '''
         Выводит данные в sys.stdout в виде таблицы.
 
@@ -296,7 +977,8 @@ class Reader(BaseDb):
             курсор с данными для вывода.
         '''
 
-        table = prettytable.PrettyTable()
+        import prettytable
+
         table = prettytable.from_db_cursor(to_print)
         table.field_names = ['Номер распоряжения',
                              'Дата установки курса',
@@ -308,7 +990,9 @@ class Reader(BaseDb):
 
 @contextmanager
 def close_manager():
-    '''Менеджер контекста, закрывающий базу данных.'''
+    '''Менеджер контекста, закрывающий все подключения к базам данных.'''
 
-    yield
-    BaseDb().close()
+    try:
+        yield
+    finally:
+        connections.close_all()
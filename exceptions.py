@@ -1,5 +1,7 @@
-import requests
-import sqlite3
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import requests
 
 
 class InputError(Exception):
@@ -31,6 +33,35 @@ class DateOutOfRangeError(Exception):
         return note
 
 
+class DateRangeError(Exception):
+    '''Вызывается при запуске скрипта с неверным диапазоном дат.'''
+
+    def __str__(self):
+        note = 'Начальная дата диапазона больше конечной.'
+        note += '\nПовторите запуск, указав диапазон в формате'
+        note += ' ДД.ММ.ГГГГ-ДД.ММ.ГГГГ'
+        return note
+
+
+class PortInputError(Exception):
+    '''Вызывается при запуске сервера с неверным номером порта.'''
+
+    def __str__(self):
+        note = 'Порт введен неверно.'
+        note += '\nПовторите запуск, указав порт числом от 1 до 65535'
+        return note
+
+
+class ExportFormatError(Exception):
+    '''Вызывается при выгрузке в файл неподдерживаемого формата.'''
+
+    def __str__(self):
+        note = 'Неподдерживаемый формат файла выгрузки.'
+        note += '\nПовторите запуск, указав файл с расширением'
+        note += ' .csv, .jsonl или .parquet'
+        return note
+
+
 class AdditionalArgumentsError(Exception):
     '''Вызывается при запуске скрипта с дополнительными аргументами.'''
 
@@ -43,20 +74,47 @@ class AdditionalArgumentsError(Exception):
 class RequestError(Exception):
     '''Вызывается при ошибке соединения с сервером.'''
 
-    def __init__(self, response: requests.Response):
+    def __init__(self, response: 'requests.Response | None'):
         '''
         Аргументы:
-            response - данные ответа сервера.
+            response - данные ответа сервера или None, если соединение
+            установить не удалось.
         '''
 
         self.response = response
 
     def __str__(self):
+        if self.response is None:
+            return 'Невозможно установить соединение с сервером.'
         note = f'Отказ сервера. Код ответа: {self.response.status_code}'
         return note
 
 
-class DbCreationError(sqlite3.OperationalError):
+class CurrencyNotFoundError(Exception):
+    '''Вызывается при пересчете суммы в валюту, курса которой нет.'''
+
+    def __init__(self, code: str):
+        '''
+        Аргументы:
+            code - числовой код валюты.
+        '''
+
+        self.code = code
+
+    def __str__(self):
+        note = f'Курс валюты с кодом {self.code} не найден.'
+        return note
+
+
+class DbError(Exception):
+    '''Базовый класс ошибок хранилища курсов.'''
+
+    def __str__(self):
+        note = 'Ошибка БД.'
+        return note
+
+
+class DbCreationError(DbError):
     '''Вызывается при ошибке создания таблиц в БД.'''
 
     def __str__(self):
@@ -64,7 +122,7 @@ class DbCreationError(sqlite3.OperationalError):
         return note
 
 
-class DbDateError(sqlite3.OperationalError):
+class DbDateError(DbError):
     '''Вызывается при ошибке внесения даты в БД.'''
 
     def __str__(self):
@@ -72,7 +130,7 @@ class DbDateError(sqlite3.OperationalError):
         return note
 
 
-class DbCheckError(sqlite3.OperationalError):
+class DbCheckError(DbError):
     '''Вызывается при ошибке проверки данных в БД.'''
 
     def __str__(self):
@@ -80,7 +138,7 @@ class DbCheckError(sqlite3.OperationalError):
         return note
 
 
-class DbRatesError(sqlite3.OperationalError):
+class DbRatesError(DbError):
     '''Вызывается при ошибке внесения данных валют в БД.'''
 
     def __str__(self):
@@ -88,7 +146,7 @@ class DbRatesError(sqlite3.OperationalError):
         return note
 
 
-class DbReadError(sqlite3.OperationalError):
+class DbReadError(DbError):
     '''Вызывается при ошибке чтения данных БД.'''
 
     def __str__(self):
@@ -0,0 +1,114 @@
+import csv
+import json
+from collections.abc import Iterator
+
+import db
+import logs
+
+FIELDS = (
+    'date', 'name', 'numeric_code', 'alphabetic_code', 'scale', 'rate'
+)
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.parquet': 'parquet',
+}
+
+
+def _write_csv(path: str, chunks: Iterator[list[tuple]]) -> int:
+    rows = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _write_jsonl(path: str, chunks: Iterator[list[tuple]]) -> int:
+    rows = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.writelines(
+                json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n'
+                for row in chunk
+            )
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(path: str, chunks: Iterator[list[tuple]]) -> int:
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema([
+        ('date', pyarrow.string()),
+        ('name', pyarrow.string()),
+        ('numeric_code', pyarrow.string()),
+        ('alphabetic_code', pyarrow.string()),
+        ('scale', pyarrow.int32()),
+        ('rate', pyarrow.string()),
+    ])
+    rows = 0
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            writer.write_table(pyarrow.table(
+                [pyarrow.array(column, type=field.type)
+                 for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            rows += len(chunk)
+    return rows
+
+
+WRITERS = {
+    'csv': _write_csv,
+    'jsonl': _write_jsonl,
+    'parquet': _write_parquet,
+}
+
+
+def export_rates(
+    path: str,
+    file_format: str,
+    start: str | None = None,
+    end: str | None = None,
+    codes: list[str] | None = None,
+    chunk_size: int = 10000
+) -> int:
+    '''
+    Выгружает курсы валют из БД в файл.
+
+    Данные считываются из БД и записываются в файл порциями по
+    chunk_size строк, поэтому расход памяти не зависит от объема
+    выгрузки. Каждая строка содержит поля FIELDS, дата записывается
+    в формате ГГГГ-ММ-ДД, курс - строкой без потери точности.
+
+    Аргументы:
+        path: путь к файлу.
+        file_format: формат файла: csv, jsonl или parquet. Для parquet
+            требуется pyarrow, каждая порция записывается отдельной
+            группой строк.
+        start: начальная дата в формате ДД.ММ.ГГГГ.
+        end: конечная дата в формате ДД.ММ.ГГГГ.
+        codes: коды валют. Если не заданы, выгружаются все курсы.
+        chunk_size: число строк в порции.
+
+    Возвращает:
+        Число выгруженных строк.
+
+    Исключения:
+        DbReadError: вызывается при ошибке БД.
+    '''
+
+    reader = db.Reader()
+    try:
+        rows = WRITERS[file_format](
+            path, reader.iter_chunks(start, end, codes, chunk_size)
+        )
+    finally:
+        reader.close()
+    logs.logger.info('Выгружено курсов: %s в файл %s', rows, path)
+    return rows
@@ -1,19 +1,137 @@
+import atexit
+import json
 import logging
+import os
+import queue
 import sys
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-import main
+LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.log')
+LOG_MAX_BYTES = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_RECORD_FIELDS = set(logging.makeLogRecord({}).__dict__) | {
+    'message', 'asctime', 'taskName'
+}
+
+
+class JsonFormatter(logging.Formatter):
+    '''
+    Форматирует запись лога в JSON-строку с полями time, level, file,
+    func и message. Поля, переданные в запись через extra (например,
+    stage и duration_ms от timed), добавляются как есть.
+    '''
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'file': record.filename,
+            'func': record.funcName,
+            'message': record.getMessage(),
+        }
+        data.update(
+            (key, value) for key, value in record.__dict__.items()
+            if key not in _RECORD_FIELDS
+        )
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
 
 
-LOG_FILE = f'logs/{main.__name__}.log'
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 stream_handler = logging.StreamHandler(sys.stdout)
-file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')
+file_handler = RotatingFileHandler(
+    LOG_FILE,
+    maxBytes=LOG_MAX_BYTES,
+    backupCount=LOG_BACKUP_COUNT,
+    encoding='utf-8',
+    delay=True
+)
 formatter = logging.Formatter(
     '%(asctime)s - %(levelname)s - %(filename)s - %(funcName)s - %(message)s',
-    '%Y-%m-%d %H:%M:%S'
+    DATE_FORMAT
 )
 stream_handler.setFormatter(formatter)
-file_handler.setFormatter(formatter)
-logger.addHandler(stream_handler)
-logger.addHandler(file_handler)
+_listener = None
+stage_hooks = []
+
+
+def configure(
+    queued: bool | None = None, json_format: bool | None = None
+) -> None:
+    '''
+    Настраивает обработчики logger.
+
+    Аргументы:
+        queued: передавать записи в stdout и файл через очередь.
+            Вызывающий поток только кладет запись в очередь, вывод
+            выполняет фоновый поток QueueListener. По умолчанию
+            включается переменной окружения LOG_QUEUE=1.
+        json_format: писать в файл JSON-строки (JsonFormatter) вместо
+            текста. По умолчанию включается переменной окружения
+            LOG_JSON=1.
+    '''
+
+    global _listener
+    if queued is None:
+        queued = os.environ.get('LOG_QUEUE') == '1'
+    if json_format is None:
+        json_format = os.environ.get('LOG_JSON') == '1'
+    stop()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    file_handler.setFormatter(
+        JsonFormatter(datefmt=DATE_FORMAT) if json_format else formatter
+    )
+    if queued:
+        records = queue.SimpleQueue()
+        _listener = QueueListener(
+            records, stream_handler, file_handler, respect_handler_level=True
+        )
+        _listener.start()
+        logger.addHandler(QueueHandler(records))
+    else:
+        logger.addHandler(stream_handler)
+        logger.addHandler(file_handler)
+
+
+def stop() -> None:
+    '''Дожидается вывода записей из очереди и останавливает QueueListener.'''
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+@contextmanager
+def timed(stage: str, **fields):
+    '''
+    Замеряет длительность этапа работы (validate, fetch, parse,
+    insert, read) и пишет в лог запись с полями stage и duration_ms
+    (в мс) и дополнительными полями fields. Длительность в секундах
+    также передается каждой функции из stage_hooks.
+    '''
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        for hook in stage_hooks:
+            hook(stage, elapsed)
+        duration = elapsed * 1000
+        logger.info(
+            'Этап %s: %.1f мс', stage, duration, stacklevel=3,
+            extra={'stage': stage, 'duration_ms': round(duration, 3),
+                   **fields}
+        )
+
+
+configure()
+atexit.register(stop)
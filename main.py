@@ -1,46 +1,239 @@
+import datetime
 import sys
 
-import api
 import db
+import logs
+from metrics import metrics
+from exceptions import InputError
 import validation
 
 
+def serve():
+    '''
+    Запускает HTTP-сервер курсов валют.
+    Необязательный аргумент командной строки - номер порта
+    (по умолчанию 8000).
+    '''
+
+    try:
+        port = validation.validate_port(sys.argv[2]) if sys.argv[2:] else 8000
+        import server
+
+        server.serve(port=port)
+    except Exception as e:
+        print(e)
+
+
+def export_rates():
+    '''
+    Выгружает курсы валют из БД в файл.
+    Аргументы командной строки: путь к файлу с расширением .csv,
+    .jsonl или .parquet, затем необязательные дата или диапазон дат
+    ДД.ММ.ГГГГ-ДД.ММ.ГГГГ и список кодов валют через запятую.
+    '''
+
+    import export
+
+    try:
+        if not sys.argv[2:]:
+            raise InputError
+        file_format = validation.validate_export_path(
+            sys.argv[2], export.FORMATS
+        )
+        start = end = codes = None
+        if sys.argv[3:]:
+            dates = validation.validate_dates(sys.argv[3])
+            start, end = dates[0], dates[-1]
+        if sys.argv[4:]:
+            codes = validation.validate_codes(sys.argv[4:])
+            if not codes:
+                return
+        with db.close_manager():
+            export.export_rates(sys.argv[2], file_format, start, end, codes)
+    except Exception as e:
+        print(e)
+
+
+SYNC_BATCH = 100
+
+
+def sync():
+    '''
+    Дополняет БД курсами за даты, которых в ней еще нет.
+    Необязательный аргумент командной строки - список кодов валют
+    через запятую. Если он не задан, вносятся курсы всех валют.
+    Флаг --no-cache отключает дисковый кэш ответов API.
+
+    Логика работы:
+        1. Находит последнюю дату, за которую в БД есть курсы.
+        2. Запрашивает у API последнюю дату, на которую установлены
+            курсы, чтобы не запрашивать неопубликованные даты.
+        3. Запрашивает курсы за каждую дату после последней
+            сохраненной порциями по SYNC_BATCH дат, запросы внутри
+            порции выполняются параллельно.
+        4. Вносит курсы каждой порции в БД одной пакетной вставкой.
+        Если БД пуста, запрашиваются курсы только за последнюю
+        опубликованную дату.
+    '''
+
+    try:
+        use_cache = not validation.pop_flag('--no-cache')
+        codes = None
+        if sys.argv[2:]:
+            codes = validation.validate_codes(sys.argv[2:])
+            if not codes:
+                return
+            codes = list(dict.fromkeys(codes))
+        import api
+
+        with db.close_manager():
+            reader = db.Reader()
+            stored = reader.latest_date()
+            latest = datetime.datetime.strptime(
+                api.ApiGetAndParse.get_latest_date(), '%d.%m.%Y'
+            ).date()
+            end = min(latest, datetime.date.today())
+            if stored is None:
+                start = end
+            else:
+                start = datetime.datetime.strptime(
+                    stored, '%d.%m.%Y'
+                ).date() + datetime.timedelta(days=1)
+            dates = [
+                (start + datetime.timedelta(days=i)).strftime('%d.%m.%Y')
+                for i in range((end - start).days + 1)
+            ]
+            if not dates:
+                logs.logger.info('БД актуальна, последняя дата: %s', stored)
+                print(f'Новых курсов нет. Последняя дата в БД: {stored}')
+                return
+            inserter = db.BulkInserter()
+            inserted = 0
+            for i in range(0, len(dates), SYNC_BATCH):
+                rates = api.get_required_currencies_on_dates(
+                    dates[i:i + SYNC_BATCH], codes, use_cache=use_cache
+                )
+                inserted += inserter.insert(rates)
+            logs.logger.info(
+                'Синхронизация %s-%s: внесено курсов: %s',
+                dates[0], dates[-1], inserted
+            )
+            print(f'Внесено курсов: {inserted} за даты {dates[0]}-{dates[-1]}')
+    except Exception as e:
+        print(e)
+
+
+def backfill():
+    '''
+    Загружает в БД курсы за диапазон дат конвейером pipeline.backfill:
+    разбор ответов сервера выполняется пулом процессов, запись - одним
+    потоком. Аргументы командной строки: дата или диапазон дат
+    ДД.ММ.ГГГГ-ДД.ММ.ГГГГ и необязательный список кодов валют
+    через запятую. Если он не задан, вносятся курсы всех валют.
+    Флаг --no-cache отключает дисковый кэш ответов API.
+    '''
+
+    try:
+        use_cache = not validation.pop_flag('--no-cache')
+        if not sys.argv[2:]:
+            raise InputError
+        dates = validation.validate_dates(sys.argv[2])
+        codes = None
+        if sys.argv[3:]:
+            codes = validation.validate_codes(sys.argv[3:])
+            if not codes:
+                return
+            codes = list(dict.fromkeys(codes))
+        import pipeline
+
+        with db.close_manager():
+            inserted = pipeline.backfill(dates, codes, use_cache=use_cache)
+        print(f'Внесено курсов: {inserted} за даты {dates[0]}-{dates[-1]}')
+    except Exception as e:
+        print(e)
+
+
+MODES = {
+    'serve': serve,
+    'export': export_rates,
+    'sync': sync,
+    'backfill': backfill,
+}
+
+
 def main():
     '''
     Основная функция скрипта.
-    Во время запуска из командной строки считываются дата и
-    список численных кодов валют.
-    Необходимый формат даты: ДД.ММ.ГГГГ
+    Если первым аргументом командной строки указан режим из MODES,
+    запускает его. Иначе во время запуска из командной строки
+    считываются дата и список численных кодов валют.
+    Необходимый формат даты: ДД.ММ.ГГГГ или диапазон дат
+    ДД.ММ.ГГГГ-ДД.ММ.ГГГГ
     Необходимый формат кодов: дву- или трехзначные числа через
     запятую без пробелов.
+    Флаг --no-cache отключает дисковый кэш ответов API.
+    Флаг --profile выводит в конце работы отчет о длительности этапов,
+    запросах к API, попаданиях в кэш и внесенных строках.
 
     Логика работы:
         1. Проверяет наличие двух аргументов командной строки во время запуска.
-        2. Проверяет правильность ввода даты.
+        2. Проверяет правильность ввода даты или диапазона дат.
         3. Проверяет правильность ввода кодов.
-        4. Если были введены правильные коды, делает запрос к API
-            и получает информацию о курсах соответствующих валют.
-        5. Если все коды соответствуют валютам, записывает в БД данные,
+        4. Если были введены правильные коды, проверяет, какие из них
+            уже есть в БД за каждую дату.
+        5. Для дат, за которые в БД есть не все коды, параллельно делает
+            запросы к API и получает информацию о курсах недостающих валют.
+        6. Если все коды соответствуют валютам, записывает в БД данные,
             которые еще не были туда внесены.
-        6. Считывает данные о курсах всех ранее запрошенных валют за
-            введенную дату.
+        7. Считывает данные о курсах всех ранее запрошенных валют за
+            каждую введенную дату.
     '''
 
+    profile = validation.pop_flag('--profile')
     try:
-        validation.validate_input()
-        date = validation.validate_date(sys.argv[1])
-        codes = validation.validate_codes(sys.argv[2:])
-        if codes:
-            code_list = api.ApiGetAndParse(date).get_required_currencies(
-                set(codes)
-            )
-            if code_list:
-                with db.close_manager():
-                    db.Inserter(date, code_list).insert_date()
-                    db.Inserter(date, code_list).insert_rates()
+        if sys.argv[1:2] and sys.argv[1] in MODES:
+            MODES[sys.argv[1]]()
+        else:
+            query_rates()
+    finally:
+        if profile:
+            print(metrics.report())
+
+
+def query_rates():
+    '''
+    Получает курсы валют за даты из аргументов командной строки,
+    вносит недостающие в БД и печатает их (шаги 1-7 main).
+    '''
+
+    try:
+        with logs.timed('validate'):
+            use_cache = not validation.pop_flag('--no-cache')
+            validation.validate_input()
+            dates = validation.validate_dates(sys.argv[1])
+            codes = validation.validate_codes(sys.argv[2:])
         with db.close_manager():
-            data = db.Reader().read(date)
-            db.Reader().print(data)
+            reader = db.Reader()
+            if codes:
+                codes = list(dict.fromkeys(codes))
+                missing = {}
+                for date in dates:
+                    stored = reader.get_stored_codes(date, codes)
+                    if len(stored) != len(codes):
+                        missing[date] = [c for c in codes if c not in stored]
+                    else:
+                        logs.logger.info('Курсы за %s уже есть в БД', date)
+                if missing:
+                    import api
+
+                    rates = api.get_required_currencies_on_dates(
+                        list(missing),
+                        set().union(*missing.values()),
+                        use_cache=use_cache
+                    )
+                    db.BulkInserter().insert(rates)
+            for date in dates:
+                reader.print(reader.read(date))
     except Exception as e:
         print(e)
 
@@ -0,0 +1,167 @@
+import bisect
+import threading
+
+import logs
+from rates_cache import rates_cache
+
+BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0
+)
+PREFIX = 'cbr'
+
+
+class Histogram:
+    '''
+    Гистограмма длительностей с фиксированными границами корзин BUCKETS
+    (в секундах), как у гистограмм Prometheus.
+
+    Переменные:
+        count:int - число замеров.
+        total:float - сумма замеров в секундах.
+        max:float - наибольший замер в секундах.
+        buckets:list[int] - число замеров в каждой корзине, последняя
+            корзина - замеры больше BUCKETS[-1].
+    '''
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+
+class Metrics:
+    '''
+    Счетчики и гистограммы длительностей этапов работы скрипта.
+
+    Длительности этапов (validate, fetch, parse, insert, read)
+    поступают из logs.timed через logs.stage_hooks. Счетчики (запросы
+    к API, повторы, попадания в кэш ответов, внесенные строки)
+    увеличиваются вызовом inc в местах событий. Попадания в rates_cache
+    берутся из rates_cache.stats().
+
+    Методы:
+        inc,
+        observe,
+        snapshot,
+        report,
+        prometheus,
+        reset.
+    '''
+
+    def __init__(self) -> None:
+        self._counters: dict[str, int] = {}
+        self._stages: dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: int = 1) -> None:
+        '''Увеличивает счетчик name на value.'''
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        '''Добавляет замер длительности этапа stage в секундах.'''
+
+        with self._lock:
+            self._stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def snapshot(self) -> dict:
+        '''
+        Возвращает копию текущих значений.
+
+        Возвращает:
+            Словарь с ключами counters - {имя: значение}, stages -
+            {этап: {count, total, max, buckets}} и rates_cache -
+            результат rates_cache.stats().
+        '''
+
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'stages': {
+                    stage: {
+                        'count': h.count,
+                        'total': h.total,
+                        'max': h.max,
+                        'buckets': list(h.buckets),
+                    }
+                    for stage, h in self._stages.items()
+                },
+                'rates_cache': rates_cache.stats(),
+            }
+
+    def report(self) -> str:
+        '''Формирует текстовый отчет для вывода в конце работы скрипта.'''
+
+        data = self.snapshot()
+        lines = [
+            f'{"Этап":<10} {"Вызовов":>8} {"Всего, мс":>11} '
+            f'{"Среднее, мс":>12} {"Макс., мс":>10}'
+        ]
+        for stage, h in sorted(data['stages'].items()):
+            lines.append(
+                f'{stage:<10} {h["count"]:>8} {h["total"] * 1e3:>11.1f} '
+                f'{h["total"] * 1e3 / h["count"]:>12.2f} '
+                f'{h["max"] * 1e3:>10.2f}'
+            )
+        for name, value in sorted(data['counters'].items()):
+            lines.append(f'{name:<30} {value:>8}')
+        cache = data['rates_cache']
+        lookups = cache['hits'] + cache['misses']
+        ratio = cache['hits'] / lookups if lookups else 0.0
+        lines.append(
+            f'{"rates_cache":<30} {cache["hits"]:>8} из {lookups} '
+            f'({ratio:.0%})'
+        )
+        return '\n'.join(lines)
+
+    def prometheus(self) -> str:
+        '''Формирует значения в текстовом формате Prometheus.'''
+
+        data = self.snapshot()
+        lines = []
+        for name, value in sorted(data['counters'].items()):
+            lines += [
+                f'# TYPE {PREFIX}_{name}_total counter',
+                f'{PREFIX}_{name}_total {value}',
+            ]
+        for name in ('hits', 'misses'):
+            lines += [
+                f'# TYPE {PREFIX}_rates_cache_{name}_total counter',
+                f'{PREFIX}_rates_cache_{name}_total '
+                f'{data["rates_cache"][name]}',
+            ]
+        histogram = f'{PREFIX}_stage_duration_seconds'
+        lines.append(f'# TYPE {histogram} histogram')
+        for stage, h in sorted(data['stages'].items()):
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), h['buckets']):
+                cumulative += count
+                lines.append(
+                    f'{histogram}_bucket{{stage="{stage}",le="{bound}"}} '
+                    f'{cumulative}'
+                )
+            lines += [
+                f'{histogram}_sum{{stage="{stage}"}} {h["total"]}',
+                f'{histogram}_count{{stage="{stage}"}} {h["count"]}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        '''Обнуляет счетчики и гистограммы.'''
+
+        with self._lock:
+            self._counters.clear()
+            self._stages.clear()
+
+
+metrics = Metrics()
+logs.stage_hooks.append(metrics.observe)
@@ -0,0 +1,282 @@
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+import logs
+
+RECORDED = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'tests', 'example_response.txt'
+)
+
+_ENVELOPE = (
+    '<?xml version="1.0" encoding="utf-8"?><soap:Envelope xmlns:soap='
+    '"http://www.w3.org/2003/05/soap-envelope" xmlns:xsi="http://www.w3.org'
+    '/2001/XMLSchema-instance" xmlns:xsd="http://www.w3.org/2001/XMLSchema">'
+    '<soap:Body><{0}Response xmlns="http://web.cbr.ru/"><{0}Result>{1}'
+    '</{0}Result></{0}Response></soap:Body></soap:Envelope>'
+)
+_FAULT = (
+    '<?xml version="1.0" encoding="utf-8"?><soap:Envelope xmlns:soap='
+    '"http://www.w3.org/2003/05/soap-envelope"><soap:Body><soap:Fault>'
+    '<soap:Code><soap:Value>soap:{0}</soap:Value></soap:Code><soap:Reason>'
+    '<soap:Text xml:lang="ru">{1}</soap:Text></soap:Reason></soap:Fault>'
+    '</soap:Body></soap:Envelope>'
+)
+
+
+def _local(tag: str) -> str:
+    return tag.rpartition('}')[2]
+
+
+def recorded_valutes() -> list[dict[str, str]]:
+    '''Возвращает поля валют из записанного ответа сервера.'''
+
+    with open(RECORDED, 'r', encoding='utf-8') as f:
+        root = ElementTree.fromstring(f.read().encode('utf-8'))
+    return [
+        {_local(child.tag): (child.text or '').strip() for child in elem}
+        for elem in root.iter()
+        if _local(elem.tag) == 'ValuteCursOnDate'
+    ]
+
+
+def synthetic_valutes(count: int) -> list[dict[str, str]]:
+    '''Формирует поля count вымышленных валют.'''
+
+    return [
+        {'Vname': f'Валюта {i}', 'Vnom': str(10 ** (i % 3)),
+         'Vcurs': f'{50 + i % 100}.{i % 10000:04d}', 'Vcode': str(i + 1),
+         'VchCode': f'C{i:02d}'}
+        for i in range(count)
+    ]
+
+
+def curs_on_date(valutes: list[dict[str, str]], on_date: datetime.date) -> str:
+    '''Формирует ответ GetCursOnDateXML за дату.'''
+
+    items = ''.join(
+        '<ValuteCursOnDate>'
+        f'<Vname>{v["Vname"]:<200}</Vname><Vnom>{v["Vnom"]}</Vnom>'
+        f'<Vcurs>{v["Vcurs"]}</Vcurs><Vcode>{v["Vcode"]}</Vcode>'
+        f'<VchCode>{v["VchCode"]}</VchCode></ValuteCursOnDate>'
+        for v in valutes
+    )
+    return _ENVELOPE.format('GetCursOnDateXML', (
+        f'<ValuteData OnDate="{on_date:%Y%m%d}" xmlns="">{items}</ValuteData>'
+    ))
+
+
+def enum_valutes(valutes: list[dict[str, str]]) -> str:
+    '''Формирует ответ EnumValutesXML.'''
+
+    items = ''.join(
+        f'<EnumValutes><Vcode>R{int(v["Vcode"]):05d}</Vcode>'
+        f'<Vname>{v["Vname"]}</Vname><Vnom>{v["Vnom"]}</Vnom>'
+        f'<VnumCode>{v["Vcode"]}</VnumCode>'
+        f'<VcharCode>{v["VchCode"]}</VcharCode></EnumValutes>'
+        for v in valutes
+    )
+    return _ENVELOPE.format(
+        'EnumValutesXML', f'<ValuteData xmlns="">{items}</ValuteData>'
+    )
+
+
+def curs_dynamic(
+    valute: dict[str, str] | None,
+    from_date: datetime.date,
+    to_date: datetime.date
+) -> str:
+    '''
+    Формирует ответ GetCursDynamicXML: курс валюты за каждый день
+    диапазона, кроме воскресений и понедельников, как у ЦБ РФ.
+    '''
+
+    items = ''
+    if valute is not None:
+        day = from_date
+        while day <= to_date:
+            if day.weekday() not in (0, 6):
+                items += (
+                    f'<ValuteCursDynamic><CursDate>{day}T00:00:00+03:00'
+                    f'</CursDate><Vcode>R{int(valute["Vcode"]):05d}</Vcode>'
+                    f'<Vnom>{valute["Vnom"]}</Vnom><Vcurs>{valute["Vcurs"]}'
+                    '</Vcurs></ValuteCursDynamic>'
+                )
+            day += datetime.timedelta(days=1)
+    return _ENVELOPE.format(
+        'GetCursDynamicXML', f'<ValuteData xmlns="">{items}</ValuteData>'
+    )
+
+
+class MockCbrHandler(BaseHTTPRequestHandler):
+    '''
+    Обработчик SOAP-запросов, заменяющий веб-сервис DailyInfo ЦБ РФ.
+
+    Отвечает на методы GetCursOnDateXML (за любую дату), GetLatestDateTime,
+    EnumValutesXML и GetCursDynamicXML. Соединения не закрываются после
+    ответа (HTTP/1.1 keep-alive), как у настоящего сервера.
+
+    Переменные:
+        valutes:list - поля валют, из которых строятся ответы.
+        latency:float - задержка перед ответом в секундах.
+        jitter:float - случайная добавка к задержке, от 0 до jitter
+            секунд.
+        error_rate:float - доля запросов, на которые сервер отвечает
+            кодом 500.
+        rng:random.Random - генератор случайных чисел для задержек
+            и ошибок.
+    '''
+
+    protocol_version = 'HTTP/1.1'
+    valutes: list[dict[str, str]] = []
+    latency = 0.0
+    jitter = 0.0
+    error_rate = 0.0
+    rng = random.Random()
+    _rng_lock = threading.Lock()
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with self._rng_lock:
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            failed = self.rng.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            self._send(500, _FAULT.format('Receiver', 'Внутренняя ошибка'))
+            return
+        try:
+            status, text = 200, self._dispatch(body)
+        except Exception as e:
+            status, text = 500, _FAULT.format('Sender', escape(str(e)))
+        self._send(status, text)
+
+    def _dispatch(self, body: bytes) -> str:
+        root = ElementTree.fromstring(body)
+        call = next(
+            elem for elem in root.iter()
+            if _local(elem.tag) not in ('Envelope', 'Body')
+        )
+        method = _local(call.tag)
+        params = {_local(child.tag): child.text for child in call}
+        if method == 'GetCursOnDateXML':
+            on_date = datetime.datetime.fromisoformat(params['On_date'])
+            return curs_on_date(self.valutes, on_date.date())
+        if method == 'GetLatestDateTime':
+            return _ENVELOPE.format(
+                'GetLatestDateTime', f'{datetime.date.today()}T00:00:00'
+            )
+        if method == 'EnumValutesXML':
+            return enum_valutes(self.valutes)
+        if method == 'GetCursDynamicXML':
+            code = params['ValutaCode'].strip()
+            valute = next((
+                v for v in self.valutes if f'R{int(v["Vcode"]):05d}' == code
+            ), None)
+            return curs_dynamic(
+                valute,
+                datetime.datetime.fromisoformat(params['FromDate']).date(),
+                datetime.datetime.fromisoformat(params['ToDate']).date()
+            )
+        raise ValueError(f'Неизвестный метод: {method}')
+
+    def _send(self, status: int, text: str) -> None:
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/soap+xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        logs.logger.debug(format, *args)
+
+
+class MockCbrServer(ThreadingHTTPServer):
+    '''
+    Сервер mock_cbr. Разрывы соединений клиентом (например, по
+    таймауту чтения) пишутся в лог, а не выводятся трассировкой.
+    '''
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address) -> None:
+        logs.logger.debug(
+            'Соединение с %s прервано: %s', client_address, sys.exc_info()[1]
+        )
+
+
+def make_server(
+    host: str = '127.0.0.1',
+    port: int = 0,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    valutes: int | None = None,
+    seed: int | None = None
+) -> MockCbrServer:
+    '''
+    Создает локальный сервер, заменяющий API ЦБ РФ.
+
+    Аргументы:
+        host, port: адрес сервера. При port=0 порт выбирается системой,
+            адрес API - server_url(server).
+        latency, jitter, error_rate: см. MockCbrHandler.
+        valutes: число валют в ответе. Если не задано, отвечает
+            валютами из записанного ответа tests/example_response.txt.
+        seed: начальное значение генератора случайных чисел.
+    '''
+
+    handler = type('Handler', (MockCbrHandler,), {
+        'valutes': (
+            recorded_valutes() if valutes is None
+            else synthetic_valutes(valutes)
+        ),
+        'latency': latency,
+        'jitter': jitter,
+        'error_rate': error_rate,
+        'rng': random.Random(seed),
+    })
+    return MockCbrServer((host, port), handler)
+
+
+def server_url(httpd: ThreadingHTTPServer) -> str:
+    '''Возвращает адрес API на сервере httpd для CBR_API_URL.'''
+
+    host, port = httpd.server_address[:2]
+    return f'http://{host}:{port}/DailyInfoWebServ/DailyInfo.asmx'
+
+
+def main():
+    '''
+    Запускает сервер до прерывания с клавиатуры.
+    Необязательный аргумент командной строки - номер порта
+    (по умолчанию 8080). Параметры задаются аргументами вида
+    --latency=0.2, --jitter=0.1, --error-rate=0.05, --valutes=1000,
+    --seed=1.
+    '''
+
+    options = {}
+    for arg in list(sys.argv[1:]):
+        if arg.startswith('--'):
+            sys.argv.remove(arg)
+            name, _, value = arg[2:].partition('=')
+            options[name.replace('-', '_')] = (
+                int(value) if name in ('valutes', 'seed') else float(value)
+            )
+    port = int(sys.argv[1]) if sys.argv[1:] else 8080
+    with make_server(port=port, **options) as httpd:
+        logs.logger.info('Mock API ЦБ РФ запущен: %s', server_url(httpd))
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            logs.logger.info('Mock API ЦБ РФ остановлен')
+
+
+if __name__ == '__main__':
+    main()
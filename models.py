@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+from decimal import Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class CurrencyRate:
+    '''
+    Курс одной валюты к рублю, установленный ЦБ РФ.
+
+    Переменные:
+        name: str - наименование валюты.
+        numeric_code: str - числовой код валюты.
+        alphabetic_code: str - буквенный код валюты.
+        scale: int - номинал валюты.
+        rate: Decimal - курс номинала валюты к рублю.
+
+    Методы:
+        from_cbr.
+    '''
+
+    name: str
+    numeric_code: str
+    alphabetic_code: str
+    scale: int
+    rate: Decimal
+
+    @classmethod
+    def from_cbr(cls, fields: dict[str, str]) -> 'CurrencyRate':
+        '''
+        Создает запись из полей элемента ValuteCursOnDate ответа API.
+
+        Аргументы:
+            fields: словарь с полями Vname, Vcode, VchCode, Vnom и Vcurs.
+        '''
+
+        return cls(
+            name=fields['Vname'],
+            numeric_code=fields['Vcode'],
+            alphabetic_code=fields['VchCode'],
+            scale=int(fields['Vnom']),
+            rate=Decimal(fields['Vcurs'])
+        )
@@ -0,0 +1,203 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from decimal import Decimal
+
+import api
+import db
+from exceptions import RequestError
+import logs
+from metrics import metrics
+from models import CurrencyRate
+
+Record = tuple[str, str, str, int, str]
+
+
+def parse_response(
+    date: str, text: str, codes: list[str] | None
+) -> tuple[str, list[Record], float]:
+    '''
+    Разбирает ответ сервера в процессе пула.
+
+    Возвращает:
+        Дату, список компактных записей (name, numeric_code,
+        alphabetic_code, scale, rate) и длительность разбора в секундах.
+    '''
+
+    start = time.perf_counter()
+    records = [
+        (rate.name, rate.numeric_code, rate.alphabetic_code, rate.scale,
+         str(rate.rate))
+        for rate in api.iter_rates(text, codes)
+    ]
+    return date, records, time.perf_counter() - start
+
+
+class Writer(threading.Thread):
+    '''
+    Поток, единственный пишущий в БД в режиме backfill.
+
+    Получает из очереди курсы за даты и вносит их через
+    BulkInserter порциями по batch_dates дат, по одной транзакции
+    на порцию. Очередь ограничена, поэтому при медленной записи
+    разбор приостанавливается, а не копит курсы в памяти.
+
+    Переменные:
+        inserted:int - число внесенных курсов.
+
+    Методы:
+        put,
+        close.
+    '''
+
+    def __init__(self, batch_dates: int = db.BulkInserter._batch_dates):
+        super().__init__(name='db-writer', daemon=True)
+        self.batch_dates = batch_dates
+        self.inserted = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=batch_dates * 2)
+        self._error: Exception | None = None
+
+    def run(self) -> None:
+        inserter = db.BulkInserter()
+        batch: dict[str, list[CurrencyRate]] = {}
+        try:
+            while True:
+                item = self._queue.get()
+                if item is not None:
+                    date, records = item
+                    batch[date] = [
+                        CurrencyRate(name, code, char_code, scale,
+                                     Decimal(rate))
+                        for name, code, char_code, scale, rate in records
+                    ]
+                if batch and (item is None or len(batch) >= self.batch_dates):
+                    self.inserted += inserter.insert(batch)
+                    batch = {}
+                if item is None:
+                    break
+        except Exception as e:
+            self._error = e
+            while self._queue.get() is not None:
+                pass
+        finally:
+            inserter.close()
+
+    def put(self, date: str, records: list[Record]) -> None:
+        '''Передает курсы за дату на запись.'''
+
+        self._queue.put((date, records))
+
+    def close(self) -> int:
+        '''
+        Дожидается записи всех переданных курсов.
+
+        Возвращает:
+            Число внесенных курсов.
+
+        Исключения:
+            Ошибка БД, возникшая при записи.
+        '''
+
+        self._queue.put(None)
+        self.join()
+        if self._error is not None:
+            raise self._error
+        return self.inserted
+
+
+def backfill(
+    dates: list[str],
+    codes: list[str] | None = None,
+    processes: int | None = None,
+    fetch_workers: int = api.MAX_WORKERS,
+    batch_dates: int = db.BulkInserter._batch_dates,
+    use_cache: bool = True
+) -> int:
+    '''
+    Загружает курсы за много дат конвейером.
+
+    Ответы сервера запрашиваются пулом из fetch_workers потоков
+    (ожидание сети не держит GIL) и по мере получения разбираются
+    пулом из processes процессов, так что разбор XML масштабируется
+    по ядрам. Разобранные курсы передаются через очередь одному
+    потоку Writer, который пишет их в БД порциями по batch_dates дат.
+
+    Одновременно запрашиваются и разбираются не более
+    2 * (fetch_workers + processes) дат, следующие даты запрашиваются
+    по мере завершения разбора. Поэтому в памяти хранится ограниченное
+    число ответов сервера, а при медленной записи в БД приостанавливаются
+    и разбор, и запросы.
+
+    Аргументы:
+        dates: список дат в формате ДД.ММ.ГГГГ.
+        codes: коды валют. Если не заданы, вносятся курсы всех валют.
+        processes: число процессов разбора, по умолчанию - число ядер.
+        fetch_workers: максимальное число одновременных запросов к API.
+        batch_dates: число дат в одной транзакции записи.
+        use_cache: использовать ли дисковый кэш ответов.
+
+    Возвращает:
+        Число внесенных курсов.
+
+    Исключения:
+        DbRatesError: вызывается при ошибке записи в БД.
+    '''
+
+    def fetch(date: str) -> str:
+        return api.ApiGetAndParse(date, use_cache).get_rates_text()
+
+    api.get_session(fetch_workers)
+    window = 2 * (fetch_workers + (processes or os.cpu_count() or 1))
+    pending = iter(dates)
+    fetching: dict[Future, str] = {}
+    parsing: set[Future] = set()
+    failed = []
+    writer = Writer(batch_dates)
+    writer.start()
+    with (ThreadPoolExecutor(max_workers=fetch_workers) as fetchers,
+          ProcessPoolExecutor(
+              max_workers=processes,
+              mp_context=multiprocessing.get_context('spawn')
+          ) as parsers):
+        while True:
+            free = window - len(fetching) - len(parsing)
+            for date in itertools.islice(pending, max(free, 0)):
+                fetching[fetchers.submit(fetch, date)] = date
+            if not fetching and not parsing:
+                break
+            done, _ = wait(
+                [*fetching, *parsing], return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                if future in parsing:
+                    parsing.discard(future)
+                    try:
+                        date, records, elapsed = future.result()
+                    except Exception as e:
+                        logs.logger.error(
+                            'Ошибка разбора ответа сервера: %s', e
+                        )
+                        continue
+                    metrics.observe('parse', elapsed)
+                    if records:
+                        writer.put(date, records)
+                    continue
+                date = fetching.pop(future)
+                try:
+                    text = future.result()
+                except RequestError:
+                    failed.append(date)
+                    continue
+                parsing.add(parsers.submit(parse_response, date, text, codes))
+    inserted = writer.close()
+    if failed != []:
+        logs.logger.warning('Не удалось получить данные за даты: %s', failed)
+    logs.logger.info(
+        'Загрузка %s дат завершена, внесено курсов: %s', len(dates), inserted
+    )
+    return inserted
@@ -0,0 +1,243 @@
+import itertools
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import psycopg
+from psycopg_pool import ConnectionPool
+
+import logs
+
+_MIGRATIONS = (
+    # 1: исходная схема, совпадает со схемой SQLite версии 2.
+    '''
+    CREATE TABLE currency_orders
+        (id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        ondate TEXT NOT NULL UNIQUE,
+        isodate TEXT NOT NULL UNIQUE);
+    CREATE TABLE currency_rates
+        (order_id BIGINT NOT NULL
+            REFERENCES currency_orders (id)
+            ON DELETE CASCADE,
+        name TEXT NOT NULL,
+        numeric_code TEXT NOT NULL,
+        alphabetic_code TEXT NOT NULL,
+        scale INT NOT NULL,
+        rate TEXT NOT NULL,
+        UNIQUE (order_id, numeric_code));
+    ''',
+)
+# Ключ pg_advisory_xact_lock, под которым хосты по очереди
+# проверяют и обновляют схему.
+_SCHEMA_LOCK = 0x636272
+_COLUMNS = 'order_id, name, numeric_code, alphabetic_code, scale, rate'
+_cursor_ids = itertools.count()
+
+
+class QmarkCursor(psycopg.Cursor):
+    '''
+    Курсор psycopg, принимающий параметры запроса в виде ?, как
+    sqlite3. Благодаря ему запросы db работают с обоими хранилищами
+    без изменений.
+    '''
+
+    def execute(self, query, params=None, **kwargs):
+        if isinstance(query, str):
+            query = query.replace('?', '%s')
+        return super().execute(query, params, **kwargs)
+
+    def executemany(self, query, params_seq, **kwargs):
+        if isinstance(query, str):
+            query = query.replace('?', '%s')
+        return super().executemany(query, params_seq, **kwargs)
+
+
+class QmarkServerCursor(psycopg.ServerCursor):
+    '''
+    Именованный (серверный) курсор psycopg с параметрами в виде ?.
+    Строки выборки остаются на сервере и передаются порциями
+    при обращении к ним.
+    '''
+
+    def execute(self, query, params=None, **kwargs):
+        if isinstance(query, str):
+            query = query.replace('?', '%s')
+        return super().execute(query, params, **kwargs)
+
+
+def _migrate(con: psycopg.Connection) -> None:
+    '''
+    Сверяет версию схемы базы (таблица schema_version) с числом
+    миграций в _MIGRATIONS и применяет недостающие. Хосты, одновременно
+    подключившиеся к новой базе, выполняют миграции по очереди.
+    '''
+
+    with con.transaction():
+        con.execute('SELECT pg_advisory_xact_lock(?)', (_SCHEMA_LOCK,))
+        con.execute(
+            'CREATE TABLE IF NOT EXISTS schema_version (version INT NOT NULL)'
+        )
+        (version,) = con.execute(
+            'SELECT COALESCE(MAX(version), 0) FROM schema_version'
+        ).fetchone()
+        for number, script in enumerate(_MIGRATIONS, start=1):
+            if number <= version:
+                continue
+            con.execute(script)
+            con.execute(
+                'INSERT INTO schema_version (version) VALUES (?)', (number,)
+            )
+            logs.logger.info('Схема БД обновлена до версии %s', number)
+
+
+class PostgresBackend:
+    '''
+    Хранилище курсов в PostgreSQL, которое могут использовать
+    одновременно несколько хостов.
+
+    Подключения берутся из пула psycopg_pool размером от _min_size
+    до _max_size: каждый объект BaseDb получает свое подключение
+    и возвращает его в пул при закрытии. Пул открывается при первом
+    обращении, тогда же проверяется и при необходимости обновляется
+    схема. Подключения работают в режиме autocommit, а записи
+    из нескольких запросов выполняются в транзакции transaction.
+
+    Курсы вносятся командой COPY во временную таблицу и переносятся
+    в currency_rates одним запросом INSERT ... ON CONFLICT DO NOTHING,
+    поэтому курсы, уже внесенные другим хостом, пропускаются.
+
+    Переменные:
+        errors:tuple - классы ошибок драйвера, которые BaseDb
+            переводит в исключения Db*Error.
+
+    Методы:
+        acquire,
+        release,
+        transaction,
+        insert_rates,
+        streaming_cursor,
+        close.
+    '''
+
+    errors = (psycopg.Error,)
+    _min_size = 1
+    _max_size = 10
+    _timeout = 30.0
+
+    def __init__(self, url: str):
+        '''
+        Аргументы:
+            url - строка подключения вида postgresql://user@host/dbname.
+        '''
+
+        self.url = url
+        self._pool: ConnectionPool | None = None
+        self._lock = threading.Lock()
+
+    def acquire(self) -> psycopg.Connection:
+        '''
+        Возвращает подключение из пула, открывая пул при необходимости.
+
+        Исключения:
+            psycopg.Error: вызывается, если не удалось подключиться
+            к базе или обновить ее схему.
+        '''
+
+        with self._lock:
+            if self._pool is None:
+                pool = ConnectionPool(
+                    self.url,
+                    min_size=self._min_size,
+                    max_size=self._max_size,
+                    timeout=self._timeout,
+                    kwargs={
+                        'autocommit': True,
+                        'cursor_factory': QmarkCursor,
+                    },
+                    open=False
+                )
+                try:
+                    pool.open(wait=True, timeout=self._timeout)
+                    with pool.connection() as con:
+                        _migrate(con)
+                except psycopg.Error:
+                    pool.close()
+                    raise
+                self._pool = pool
+            pool = self._pool
+        return pool.getconn()
+
+    def release(self, con: psycopg.Connection) -> None:
+        '''Возвращает подключение в пул.'''
+
+        with self._lock:
+            pool = self._pool
+        if pool is not None:
+            pool.putconn(con)
+        else:
+            con.close()
+
+    def transaction(self, con: psycopg.Connection) -> psycopg.Transaction:
+        '''
+        Возвращает менеджер контекста транзакции: при выходе без ошибок
+        она фиксируется, иначе откатывается.
+        '''
+
+        return con.transaction()
+
+    def insert_rates(self, cur: psycopg.Cursor, rows: list[tuple]) -> int:
+        '''
+        Вносит курсы командой COPY. Вызывается внутри transaction.
+
+        Аргументы:
+            cur: курсор подключения.
+            rows: строки (order_id, name, numeric_code, alphabetic_code,
+                scale, rate).
+
+        Возвращает:
+            Число внесенных курсов.
+        '''
+
+        cur.execute(
+            '''CREATE TEMP TABLE IF NOT EXISTS currency_rates_stage
+               (LIKE currency_rates) ON COMMIT DELETE ROWS'''
+        )
+        with cur.copy(
+            f'COPY currency_rates_stage ({_COLUMNS}) FROM STDIN'
+        ) as copy:
+            for row in rows:
+                copy.write_row(row)
+        cur.execute(
+            f'''INSERT INTO currency_rates ({_COLUMNS})
+                SELECT {_COLUMNS} FROM currency_rates_stage
+                ON CONFLICT DO NOTHING'''
+        )
+        return cur.rowcount
+
+    @contextmanager
+    def streaming_cursor(
+        self, con: psycopg.Connection
+    ) -> Iterator[QmarkServerCursor]:
+        '''
+        Менеджер контекста серверного курсора для потокового чтения
+        больших выборок. Обычный курсор psycopg загружает всю выборку
+        в память при выполнении запроса, а серверный отдает строки
+        порциями по мере fetchmany и итерации. Серверный курсор
+        существует только внутри транзакции, поэтому она открывается
+        на время чтения.
+        '''
+
+        with con.transaction():
+            cursor = QmarkServerCursor(con, f'cbr_range_{next(_cursor_ids)}')
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self) -> None:
+        '''Закрывает пул и все его подключения.'''
+
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+from models import CurrencyRate
+
+
+class RatesCache:
+    '''
+    Ограниченный по размеру LRU-кэш таблиц курсов валют за дату.
+
+    Ключ - дата в формате ДД.ММ.ГГГГ, значение - словарь
+    {числовой код валюты: CurrencyRate}. Таблица, полученная из полного
+    ответа API, помечается как полная: по ней можно определить, что
+    валюты с заданным кодом за дату нет. Таблицы, собранные из части
+    ответа или из БД, неполны и отвечают только на запросы кодов,
+    которые в них есть.
+
+    Если таблиц больше maxsize, удаляется та, к которой дольше всего
+    не обращались. Если задан ttl, таблицы старше ttl секунд
+    считаются устаревшими. Возраст таблицы отсчитывается от первой
+    записи в нее: дополнение таблицы курсами его не сбрасывает.
+
+    Переменные:
+        maxsize:int - максимальное число хранимых дат.
+        ttl:float|None - время жизни таблицы в секундах.
+        hits:int - число запросов, на которые кэш ответил.
+        misses:int - число запросов, на которые кэш ответить не смог.
+
+    Методы:
+        get,
+        put,
+        stats,
+        clear.
+    '''
+
+    def __init__(self, maxsize: int = 128, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._tables: OrderedDict[
+            str, tuple[dict[str, CurrencyRate], bool, float]
+        ] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self, date: str, codes: Iterable[str] | None = None
+    ) -> dict[str, CurrencyRate] | None:
+        '''
+        Возвращает таблицу курсов за дату.
+
+        Аргументы:
+            date: дата в формате ДД.ММ.ГГГГ.
+            codes: коды валют, которые должны быть в таблице. Если
+                не заданы, таблица должна быть полной.
+
+        Возвращает:
+            Копию таблицы или None, если таблицы нет, она устарела или
+            не может ответить на запрос.
+        '''
+
+        with self._lock:
+            entry = self._tables.get(date)
+            if entry is not None and self.ttl is not None:
+                if time.monotonic() - entry[2] > self.ttl:
+                    del self._tables[date]
+                    entry = None
+            if entry is not None:
+                table, complete, _ = entry
+                if complete or (
+                    codes is not None and all(c in table for c in codes)
+                ):
+                    self._tables.move_to_end(date)
+                    self.hits += 1
+                    return dict(table)
+            self.misses += 1
+            return None
+
+    def put(
+        self,
+        date: str,
+        rates: Iterable[CurrencyRate],
+        complete: bool = False
+    ) -> None:
+        '''
+        Добавляет курсы за дату в таблицу и удаляет лишние таблицы.
+
+        Аргументы:
+            date: дата в формате ДД.ММ.ГГГГ.
+            rates: записи CurrencyRate за эту дату.
+            complete: содержат ли rates все валюты за дату.
+        '''
+
+        with self._lock:
+            now = time.monotonic()
+            entry = self._tables.pop(date, None)
+            if entry is not None and self.ttl is not None:
+                if now - entry[2] > self.ttl:
+                    entry = None
+            if entry is None:
+                table, loaded = {}, now
+            else:
+                table, complete, loaded = (
+                    dict(entry[0]), complete or entry[1], entry[2]
+                )
+            table.update((rate.numeric_code, rate) for rate in rates)
+            self._tables[date] = (table, complete, loaded)
+            while len(self._tables) > self.maxsize:
+                self._tables.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        '''Возвращает число попаданий, промахов и хранимых дат.'''
+
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._tables),
+            }
+
+    def clear(self) -> None:
+        '''Удаляет все таблицы и обнуляет счетчики.'''
+
+        with self._lock:
+            self._tables.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+rates_cache = RatesCache()
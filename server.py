@@ -0,0 +1,173 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import api
+import db
+from exceptions import (AdditionalArgumentsError,
+                        DateInputError,
+                        DateOutOfRangeError,
+                        DbError,
+                        InputError,
+                        RequestError)
+import logs
+from metrics import metrics
+from models import CurrencyRate
+import validation
+
+
+class RatesService:
+    '''
+    Сервис, отвечающий на запросы курсов валют за дату.
+
+    Держит открытыми подключение к БД и HTTP-сессию API. Курсы ищутся
+    сначала в rates_cache, затем в БД, и только недостающие
+    запрашиваются у API и вносятся в БД.
+
+    Методы:
+        get_rates.
+    '''
+
+    def __init__(self) -> None:
+        self._reader = db.Reader()
+        self._inserter = db.BulkInserter()
+        self._db_lock = threading.Lock()
+
+    def get_rates(
+        self, date: str, codes: list[str]
+    ) -> tuple[list[CurrencyRate], list[str]]:
+        '''
+        Возвращает курсы запрошенных валют за дату.
+
+        Аргументы:
+            date: дата в формате ДД.ММ.ГГГГ.
+            codes: список, содержащий запрошенные коды в виде строк.
+
+        Возвращает:
+            Список записей CurrencyRate и список кодов, курсы которых
+            найти не удалось.
+
+        Исключения:
+            RequestError, если API ЦБ РФ недоступен.
+        '''
+
+        with self._db_lock:
+            stored = self._reader.get_rates(date, codes)
+        known = {rate.numeric_code: rate for rate in stored}
+        missing = [code for code in codes if code not in known]
+        if missing:
+            fetched = api.ApiGetAndParse(date).get_required_currencies(
+                missing
+            )
+            if fetched:
+                with self._db_lock:
+                    self._inserter.insert({date: fetched})
+                known.update({rate.numeric_code: rate for rate in fetched})
+        rates = [known[code] for code in codes if code in known]
+        return rates, [code for code in codes if code not in known]
+
+
+class RatesRequestHandler(BaseHTTPRequestHandler):
+    '''
+    Обработчик HTTP-запросов вида
+    GET /rates?date=ДД.ММ.ГГГГ&codes=36,978.
+
+    Отвечает JSON-объектом с полями date, rates и not_found.
+    При неверных параметрах отвечает кодом 400, при недоступности
+    API ЦБ РФ - кодом 502, при ошибке БД и прочих ошибках - кодом 500.
+    На запрос GET /metrics отвечает значениями metrics в текстовом
+    формате Prometheus.
+    '''
+
+    service: RatesService
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == '/metrics':
+            self._send_text(200, metrics.prometheus())
+            return
+        if url.path != '/rates':
+            self._send(404, {'error': 'Not found'})
+            return
+        params = parse_qs(url.query)
+        try:
+            if 'date' not in params or 'codes' not in params:
+                raise InputError
+            date = validation.validate_date(params['date'][0])
+            codes = validation.validate_codes(params['codes'][:1])
+            if not codes:
+                raise InputError
+            rates, not_found = self.service.get_rates(
+                date, list(dict.fromkeys(codes))
+            )
+        except (InputError, DateInputError, DateOutOfRangeError,
+                AdditionalArgumentsError) as e:
+            self._send(400, {'error': str(e)})
+        except RequestError as e:
+            self._send(502, {'error': str(e)})
+        except DbError as e:
+            self._send(500, {'error': str(e)})
+        except Exception:
+            logs.logger.exception('Ошибка обработки запроса %s', self.path)
+            self._send(500, {'error': 'Внутренняя ошибка сервера.'})
+        else:
+            self._send(200, {
+                'date': date,
+                'rates': [
+                    {'name': rate.name,
+                     'numeric_code': rate.numeric_code,
+                     'alphabetic_code': rate.alphabetic_code,
+                     'scale': rate.scale,
+                     'rate': str(rate.rate)}
+                    for rate in rates
+                ],
+                'not_found': not_found,
+            })
+
+    def _send(self, status: int, body: dict) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, status: int, text: str) -> None:
+        data = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        logs.logger.info(format, *args)
+
+
+def make_server(host: str, port: int) -> ThreadingHTTPServer:
+    '''
+    Создает HTTP-сервер курсов валют с общим для всех запросов
+    экземпляром RatesService.
+    '''
+
+    handler = type(
+        'Handler', (RatesRequestHandler,), {'service': RatesService()}
+    )
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host: str = '127.0.0.1', port: int = 8000) -> None:
+    '''
+    Запускает HTTP-сервер курсов валют и обслуживает запросы до
+    прерывания с клавиатуры. Логи выводятся через очередь, чтобы
+    потоки обработчиков не ждали записи в файл.
+    '''
+
+    logs.configure(queued=True)
+    with db.close_manager(), make_server(host, port) as httpd:
+        logs.logger.info('Сервер запущен на http://%s:%s', host, port)
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            logs.logger.info('Сервер остановлен')
@@ -0,0 +1,40 @@
+import os
+from unittest import mock
+
+import pytest
+
+import api
+import db
+from metrics import metrics
+from rates_cache import rates_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_rates_cache():
+    rates_cache.clear()
+    yield
+    rates_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def isolate_api(tmp_path):
+    with (mock.patch.object(api.ResponseCache, '_cache_dir', str(tmp_path)),
+          mock.patch.object(api.ApiGetAndParse, '_backoff', 0),
+          mock.patch.object(api.ApiCursDynamic, '_valutes', None)):
+        yield
+
+
+@pytest.fixture
+def isolate_db():
+    with mock.patch.object(db.BaseDb, '_db_name', 'test.db'):
+        yield
+    db.connections.close_all()
+    if os.path.exists('test.db'):
+        os.remove('test.db')
@@ -1,9 +1,20 @@
+import asyncio
+import datetime
+import os
+import time
+from decimal import Decimal
+from unittest import mock
 from unittest.mock import patch
 
 import pytest
+import requests
 
 import api
 from exceptions import RequestError
+from models import CurrencyRate
+from rates_cache import rates_cache
+
+pytestmark = pytest.mark.usefixtures('isolate_api')
 
 date = '14.12.2024'
 
@@ -20,7 +31,7 @@ def get_test_response():
 
 
 def test_get_rates_data_good_status_code():
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_post.return_value.status_code = 200
         a = api.ApiGetAndParse(date).get_rates_data()
         err_msg = 'Проверьте, что при ответе сервера с кодом '
@@ -29,7 +40,7 @@ def test_get_rates_data_good_status_code():
 
 
 def test_get_rates_data_bad_status_code():
-    with (patch('requests.post') as mock_post,
+    with (patch('requests.Session.post') as mock_post,
           pytest.raises(RequestError) as e_info):
         mock_post.return_value.status_code = 404
         api.ApiGetAndParse(date).get_rates_data()
@@ -39,26 +50,294 @@ def test_get_rates_data_bad_status_code():
 
 
 def test_parse_rates_data(get_test_response):
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_post.return_value.status_code = 200
         mock_post.return_value.text = get_test_response
         a = api.ApiGetAndParse(date).parse_rates_data()
         err_msg = 'Проверьте, что при корректном ответе сервера parse_'
-        err_msg += 'rates_data возвращает список словарей с курсами валют'
+        err_msg += 'rates_data возвращает список записей с курсами валют'
         assert a, err_msg
         assert type(a) is list, err_msg
-        assert a[0].get('Vname') == 'Австралийский доллар', err_msg
+        assert a[0].name == 'Австралийский доллар', err_msg
 
 
 def test_get_required_currencies(get_test_response):
-    with patch('requests.post') as mock_post:
+    with patch('requests.Session.post') as mock_post:
         mock_post.return_value.status_code = 200
         mock_post.return_value.text = get_test_response
         a = api.ApiGetAndParse(date).get_required_currencies(['36', '000'])
         err_msg = 'Проверьте, что get_required_currencies '
         err_msg += 'возвращает данные только для корректных кодов'
-        assert a[0].get('Vcode') == '36', err_msg
+        assert a[0].numeric_code == '36', err_msg
         a = api.ApiGetAndParse(date).get_required_currencies(['000'])
         err_msg = 'Проверьте, что при отсутствии в запросе корректных кодов'
         err_msg += 'get_required_currencies возвращает False'
         assert a is False, err_msg
+
+
+def test_missing_codes_cached(get_test_response):
+    today = datetime.date.today().strftime('%d.%m.%Y')
+    with patch('requests.Session.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = get_test_response
+        api.ApiGetAndParse(today).get_required_currencies(['36', '999'])
+        a = api.ApiGetAndParse(today).get_required_currencies(['36', '999'])
+    err_msg = 'Проверьте, что отсутствие кода за дату запоминается '
+    err_msg += 'в rates_cache и не вызывает повторного запроса к API'
+    assert mock_post.call_count == 1, err_msg
+    assert [rate.numeric_code for rate in a] == ['36'], err_msg
+    assert rates_cache.get(today) is not None, err_msg
+
+
+def test_get_required_currencies_on_dates(get_test_response):
+    dates = ['13.12.2024', '14.12.2024']
+    with patch('requests.Session.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = get_test_response
+        a = api.get_required_currencies_on_dates(dates, ['36'], 2)
+        err_msg = 'Проверьте, что get_required_currencies_on_dates '
+        err_msg += 'возвращает данные за каждую запрошенную дату'
+        assert list(a) == dates, err_msg
+        assert a['13.12.2024'][0].numeric_code == '36', err_msg
+        mock_post.return_value.status_code = 500
+        a = api.get_required_currencies_on_dates(
+            dates, ['36'], 2, use_cache=False
+        )
+        err_msg = 'Проверьте, что даты, за которые не удалось получить '
+        err_msg += 'данные, не попадают в результат'
+        assert a == {}, err_msg
+
+
+def test_response_cache(get_test_response, tmp_path):
+    with patch('requests.Session.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = get_test_response
+        api.ApiGetAndParse(date).parse_rates_data()
+        a = api.ApiGetAndParse(date).parse_rates_data()
+        err_msg = 'Проверьте, что повторный запрос за прошедшую дату '
+        err_msg += 'берется из кэша'
+        assert mock_post.call_count == 1, err_msg
+        assert a[0].name == 'Австралийский доллар', err_msg
+        api.ApiGetAndParse(date, use_cache=False).parse_rates_data()
+        err_msg = 'Проверьте, что use_cache=False отключает кэш'
+        assert mock_post.call_count == 2, err_msg
+    with (mock.patch.object(api.ResponseCache, '_max_entries', 1),
+          patch('requests.Session.post') as mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = get_test_response
+        api.ApiGetAndParse('13.12.2024').parse_rates_data()
+        err_msg = 'Проверьте, что лишние записи кэша удаляются'
+        assert [p.name for p in tmp_path.iterdir()] == [
+            '2024-12-13.xml'
+        ], err_msg
+
+
+def test_response_cache_evicts_in_batches(tmp_path):
+    cache = api.ResponseCache()
+    dates = [f'2024-01-{day:02}T00:00:00' for day in range(1, 12)]
+    with mock.patch.object(api.ResponseCache, '_max_entries', 10):
+        for day in dates:
+            cache.set(day, 'text')
+        err_msg = 'Проверьте, что при переполнении кэш сокращается '
+        err_msg += 'до _evict_ratio от _max_entries'
+        assert len(list(tmp_path.iterdir())) == 9, err_msg
+        with mock.patch('os.scandir', wraps=os.scandir) as mock_scandir:
+            cache.set('2024-02-01T00:00:00', 'text')
+        err_msg = 'Проверьте, что запись в неполный кэш не просматривает '
+        err_msg += 'каталог'
+        assert not mock_scandir.called, err_msg
+
+
+def test_response_cache_max_age(tmp_path):
+    cache = api.ResponseCache()
+    day = '2024-01-01T00:00:00'
+    path = tmp_path / '2024-01-01.xml'
+    cache.set(day, 'text')
+    written = time.time() - 10
+    os.utime(path, (written, written))
+    with mock.patch.object(api.ResponseCache, '_max_age', 60):
+        assert cache.get(day) == 'text', 'Проверьте, что кэш отдает запись'
+    err_msg = 'Проверьте, что обращение к записи кэша не меняет время '
+    err_msg += 'ее записи, а обновляет время доступа'
+    assert os.stat(path).st_mtime == written, err_msg
+    assert os.stat(path).st_atime > written, err_msg
+    with mock.patch.object(api.ResponseCache, '_max_age', 5):
+        err_msg = 'Проверьте, что запись кэша устаревает через _max_age '
+        err_msg += 'секунд после записи, даже если к ней обращались'
+        assert cache.get(day) is None, err_msg
+
+
+def test_get_rates_data_retries():
+    with patch('requests.Session.post') as mock_post:
+        ok = mock.Mock(status_code=200)
+        mock_post.side_effect = [
+            requests.exceptions.ConnectionError(),
+            mock.Mock(status_code=503),
+            ok
+        ]
+        a = api.ApiGetAndParse(date).get_rates_data()
+        err_msg = 'Проверьте, что при ошибке соединения и коде ответа 5xx '
+        err_msg += 'get_rates_data повторяет запрос'
+        assert a is ok, err_msg
+        assert mock_post.call_count == 3, err_msg
+        assert mock_post.call_args.kwargs['timeout'], err_msg
+    with (patch('requests.Session.post') as mock_post,
+          pytest.raises(RequestError) as e_info):
+        mock_post.side_effect = requests.exceptions.ConnectionError()
+        api.ApiGetAndParse(date).get_rates_data()
+    err_msg = 'Проверьте, что после исчерпания попыток вызывается RequestError'
+    assert e_info.value.response is None, err_msg
+    assert mock_post.call_count == api.ApiGetAndParse._retries + 1, err_msg
+
+
+def test_iter_rates(get_test_response):
+    single = get_test_response[:get_test_response.index('<ValuteCursOnDate>')]
+    single += '<ValuteCursOnDate><Vname>Евро </Vname><Vnom>1</Vnom>'
+    single += '<Vcurs>109.0126</Vcurs><Vcode>978</Vcode><VchCode>EUR</VchCode>'
+    single += '</ValuteCursOnDate></ValuteData></GetCursOnDateXMLResult>'
+    single += '</GetCursOnDateXMLResponse></soap:Body></soap:Envelope>'
+    a = list(api.iter_rates(single))
+    err_msg = 'Проверьте, что iter_rates корректно разбирает ответ '
+    err_msg += 'с единственной валютой'
+    euro = CurrencyRate('Евро', '978', 'EUR', 1, Decimal('109.0126'))
+    assert a == [euro], err_msg
+    end = get_test_response.index('<Vcode>944')
+    end = get_test_response.index('</ValuteCursOnDate>', end)
+    truncated = get_test_response[:end] + '</ValuteCursOnDate><broken'
+    rates = api.iter_rates(truncated, ['944', '36'])
+    err_msg = 'Проверьте, что iter_rates прекращает разбор, '
+    err_msg += 'как только найдены все коды'
+    assert [i.numeric_code for i in rates] == ['36', '944'], err_msg
+
+
+def test_async_client_coalesces_requests(get_test_response):
+    def slow_post(*args, **kwargs):
+        time.sleep(0.05)
+        return mock.Mock(status_code=200, text=get_test_response)
+
+    async def lookup():
+        client = api.AsyncApiGetAndParse(max_concurrency=2, use_cache=False)
+        same_date = await asyncio.gather(
+            *(client.get_required_currencies(date, ['36']) for _ in range(5))
+        )
+        many_dates = await client.get_required_currencies_on_dates(
+            ['10.12.2024', '11.12.2024', '12.12.2024'], ['36', '978']
+        )
+        return same_date, many_dates
+
+    async def lookup_spellings():
+        client = api.AsyncApiGetAndParse(use_cache=False)
+        await asyncio.gather(
+            client.get_rates_text('01.12.2024'),
+            client.get_rates_text('1.12.2024')
+        )
+
+    with patch('requests.Session.post', side_effect=slow_post) as mock_post:
+        same_date, many_dates = asyncio.run(lookup())
+    err_msg = 'Проверьте, что одновременные запросы за одну дату '
+    err_msg += 'выполняются одним обращением к серверу'
+    assert all(a[0].numeric_code == '36' for a in same_date), err_msg
+    assert mock_post.call_count == 4, err_msg
+    err_msg = 'Проверьте, что get_required_currencies_on_dates '
+    err_msg += 'возвращает данные за каждую дату'
+    assert list(many_dates) == [
+        '10.12.2024', '11.12.2024', '12.12.2024'
+    ], err_msg
+    assert len(many_dates['12.12.2024']) == 2, err_msg
+    with patch('requests.Session.post', side_effect=slow_post) as mock_post:
+        asyncio.run(lookup_spellings())
+    err_msg = 'Проверьте, что записи одной даты с нулем и без нуля '
+    err_msg += 'объединяются в один запрос'
+    assert mock_post.call_count == 1, err_msg
+
+
+def test_async_client_reuse(get_test_response):
+    client = api.AsyncApiGetAndParse(max_concurrency=16, use_cache=False)
+    with patch('requests.Session.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = get_test_response
+        for _ in range(2):
+            a = asyncio.run(client.get_required_currencies(date, ['36']))
+    err_msg = 'Проверьте, что клиент можно использовать в нескольких '
+    err_msg += 'циклах событий'
+    assert a[0].numeric_code == '36', err_msg
+    adapter = api.get_session().get_adapter('https://www.cbr.ru')
+    err_msg = 'Проверьте, что пул соединений сессии не меньше '
+    err_msg += 'max_concurrency'
+    assert adapter._pool_maxsize >= 16, err_msg
+
+
+def test_get_latest_date():
+    text = (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<soap:Envelope xmlns:soap="http://www.w3.org/2003/05/'
+        'soap-envelope"><soap:Body><GetLatestDateTimeResponse '
+        'xmlns="http://web.cbr.ru/"><GetLatestDateTimeResult>'
+        '2024-12-14T00:00:00</GetLatestDateTimeResult>'
+        '</GetLatestDateTimeResponse></soap:Body></soap:Envelope>'
+    )
+    with patch('requests.Session.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = text
+        latest = api.ApiGetAndParse.get_latest_date()
+    err_msg = 'Проверьте, что get_latest_date возвращает последнюю дату '
+    err_msg += 'курсов в формате ДД.ММ.ГГГГ'
+    assert latest == '14.12.2024', err_msg
+    assert b'GetLatestDateTime' in mock_post.call_args.kwargs['data'], err_msg
+
+
+def soap_response(method, items):
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<soap:Envelope xmlns:soap="http://www.w3.org/2003/05/'
+        f'soap-envelope"><soap:Body><{method}Response '
+        f'xmlns="http://web.cbr.ru/"><{method}Result><ValuteData '
+        'xmlns="">' + items + '</ValuteData>'
+        f'</{method}Result></{method}Response></soap:Body></soap:Envelope>'
+    )
+
+
+def test_cursdynamic_range():
+    valutes = soap_response(
+        'EnumValutesXML',
+        '<EnumValutes><Vcode>R01010 </Vcode><Vname>Австралийский доллар'
+        '</Vname><Vnom>1</Vnom><VnumCode>36</VnumCode>'
+        '<VcharCode>AUD</VcharCode></EnumValutes>'
+    )
+    dynamics = soap_response(
+        'GetCursDynamicXML',
+        '<ValuteCursDynamic><CursDate>2024-12-07T00:00:00+03:00</CursDate>'
+        '<Vcode>R01010</Vcode><Vnom>1</Vnom><Vcurs>66.2</Vcurs>'
+        '</ValuteCursDynamic>'
+        '<ValuteCursDynamic><CursDate>2024-12-10T00:00:00+03:00</CursDate>'
+        '<Vcode>R01010</Vcode><Vnom>1</Vnom><Vcurs>65.9</Vcurs>'
+        '</ValuteCursDynamic>'
+    )
+
+    def post(url, headers, data, timeout):
+        response = mock.Mock(status_code=200)
+        if b'EnumValutesXML' in data:
+            response.text = valutes
+        else:
+            response.text = dynamics
+        return response
+
+    dates = ['08.12.2024', '09.12.2024', '10.12.2024', '11.12.2024']
+    with patch('requests.Session.post', side_effect=post) as mock_post:
+        a = api.get_required_currencies_on_dates(dates, ['36', '000'])
+    err_msg = 'Проверьте, что запрос малого числа валют за много дат '
+    err_msg += 'выполняется через GetCursDynamicXML, по запросу на валюту'
+    assert mock_post.call_count == 2, err_msg
+    err_msg = 'Проверьте, что курс переносится на даты, на которые '
+    err_msg += 'ЦБ РФ его не устанавливал'
+    assert list(a) == dates, err_msg
+    assert [rates[0].rate for rates in a.values()] == [
+        Decimal('66.2'), Decimal('66.2'), Decimal('65.9'), Decimal('65.9')
+    ], err_msg
+    assert a['08.12.2024'][0].alphabetic_code == 'AUD', err_msg
+    dates = [f'{day}.12.2024' for day in range(10, 31)]
+    with patch('requests.Session.post', side_effect=post) as mock_post:
+        a = api.get_required_currencies_on_dates(dates, ['36'])
+    err_msg = 'Проверьте, что курс оборвавшегося ряда переносится '
+    err_msg += 'не более чем на _lookback дней'
+    assert list(a) == dates[:api.ApiCursDynamic._lookback + 1], err_msg
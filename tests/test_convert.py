@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+import pytest
+
+import convert
+import exceptions
+from models import CurrencyRate
+
+rates = [
+    CurrencyRate('Евро', '978', 'EUR', 1, Decimal('100')),
+    CurrencyRate('Армянский драм', '51', 'AMD', 100, Decimal('25')),
+]
+
+
+def test_rate_and_convert():
+    converter = convert.Converter(rates)
+    err_msg = 'Проверьте, что кросс-курс учитывает номинал валюты'
+    assert converter.rate('978', '51') == Decimal('400'), err_msg
+    err_msg = 'Проверьте, что convert точно пересчитывает сумму'
+    assert converter.convert(Decimal('2.5'), '978', '643') == Decimal(
+        '250'
+    ), err_msg
+    assert converter.convert(1000, '51', '978') == Decimal('2.5'), err_msg
+    with pytest.raises(exceptions.CurrencyNotFoundError):
+        converter.convert(1, '978', '840')
+
+
+def test_convert_many():
+    converter = convert.Converter(rates)
+    amounts = ['1', '2', '400']
+    exact = converter.convert_many(amounts, ['978', '643', '51'], '978', True)
+    err_msg = 'Проверьте, что convert_many точно пересчитывает массив сумм'
+    assert exact == [Decimal('1'), Decimal('0.02'), Decimal('1')], err_msg
+    fast = converter.convert_many(
+        [1.0, 2.0, 400.0], ['978', '643', '51'], '978'
+    )
+    err_msg = 'Проверьте, что convert_many в быстром режиме совпадает '
+    err_msg += 'с точным'
+    assert [float(x) for x in fast] == pytest.approx(
+        [float(x) for x in exact]
+    ), err_msg
+    with pytest.raises(exceptions.CurrencyNotFoundError):
+        converter.convert_many([1], ['840'], '643')
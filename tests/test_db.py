@@ -1,19 +1,21 @@
 import os
+import sqlite3
+from decimal import Decimal
 from unittest import mock
 
 import pytest
 
 import db
+from exceptions import DbCreationError, DbError, DbRatesError, DbReadError
+from models import CurrencyRate
 
 
 test_date = '12.12.2024'
-test_items = [{'Vname': 'Австралийский доллар',
-               'Vnom': '1',
-               'Vcurs': '65.8247',
-               'Vcode': '36',
-               'VchCode': 'AUD',
-               'VunitRate':
-               '65.8247'}]
+test_items = [CurrencyRate(name='Австралийский доллар',
+                           numeric_code='36',
+                           alphabetic_code='AUD',
+                           scale=1,
+                           rate=Decimal('65.8247'))]
 
 
 @pytest.fixture(scope='function')
@@ -21,8 +23,8 @@ def get_test_inserter():
     with mock.patch.object(db.BaseDb, '_db_name', 'test.db'):
         a = db.Inserter(test_date, test_items)
     yield a
+    a.close()
     if os.path.exists('test.db'):
-        a.close()
         os.remove('test.db')
 
 
@@ -31,8 +33,8 @@ def get_test_reader():
     with mock.patch.object(db.BaseDb, '_db_name', 'test.db'):
         a = db.Reader()
     yield a
+    a.close()
     if os.path.exists('test.db'):
-        a.close()
         os.remove('test.db')
 
 
@@ -44,8 +46,15 @@ def test_insert_new_date(get_test_inserter):
 
 
 def test_insert_rates(get_test_inserter):
+    err_msg = 'Проверьте, что insert_rates без внесенной даты вызывает '
+    err_msg += 'DbRatesError'
+    with pytest.raises(DbRatesError):
+        get_test_inserter.insert_rates()
+    get_test_inserter.insert_date()
     err_msg = 'Проверьте, что insert_rates вносит данные в базу'
     assert get_test_inserter.insert_rates(), err_msg
+    err_msg = 'Проверьте, что insert_rates не вносит курсы повторно'
+    assert not get_test_inserter.insert_rates(), err_msg
 
 
 def test_check_existing_rates(get_test_inserter):
@@ -66,3 +75,212 @@ def test_read(get_test_inserter, get_test_reader):
     expected = (1, '12.12.2024', 'Австралийский доллар', 1, '65.8247')
     err_msg = 'Проверьте, что read корректно считывает данные из БД'
     assert result == expected, err_msg
+
+
+def test_get_stored_codes(get_test_inserter, get_test_reader):
+    err_msg = 'Проверьте, что get_stored_codes не находит коды в пустой БД'
+    assert get_test_reader.get_stored_codes(test_date, ['36']) == [], err_msg
+    get_test_inserter.insert_date()
+    get_test_inserter.insert_rates()
+    stored = get_test_reader.get_stored_codes(test_date, ['36', '978'])
+    err_msg = 'Проверьте, что get_stored_codes возвращает только коды, '
+    err_msg += 'уже внесенные в БД за заданную дату'
+    assert stored == ['36'], err_msg
+
+
+def test_get_rates(get_test_inserter, get_test_reader):
+    get_test_inserter.insert_date()
+    get_test_inserter.insert_rates()
+    err_msg = 'Проверьте, что get_rates возвращает записи CurrencyRate'
+    assert get_test_reader.get_rates(test_date) == test_items, err_msg
+    err_msg = 'Проверьте, что get_rates отбирает курсы по кодам'
+    assert get_test_reader.get_rates(test_date, ['978']) == [], err_msg
+
+
+def test_bulk_insert(get_test_inserter, get_test_reader):
+    get_test_inserter.insert_date()
+    get_test_inserter.insert_rates()
+    with mock.patch.object(db.BaseDb, '_db_name', 'test.db'):
+        bulk = db.BulkInserter()
+    euro = CurrencyRate('Евро', '978', 'EUR', 1, Decimal('109.0126'))
+    rates = {test_date: test_items + [euro], '13.12.2024': [euro]}
+    with mock.patch.object(db.BulkInserter, '_batch_dates', 1):
+        inserted = bulk.insert(rates)
+    bulk.close()
+    err_msg = 'Проверьте, что BulkInserter вносит только новые курсы'
+    assert inserted == 2, err_msg
+    assert get_test_reader.get_rates('13.12.2024') == [euro], err_msg
+    assert get_test_reader.get_stored_codes(
+        test_date, ['36', '978']
+    ) == ['36', '978'], err_msg
+
+
+def test_migrate_legacy_db(get_test_reader):
+    get_test_reader.close()
+    os.remove('test.db')
+    con = sqlite3.connect('test.db')
+    con.executescript(db._MIGRATIONS[0])
+    con.executescript('''
+        INSERT INTO currency_orders (ondate) VALUES ('12.12.2024');
+        INSERT INTO currency_orders (ondate) VALUES ('12.12.2024');
+        INSERT INTO currency_rates VALUES (1, 'Евро', '978', 'EUR', 1, '1');
+        INSERT INTO currency_rates VALUES (2, 'Евро', '978', 'EUR', 1, '1');
+    ''')
+    con.close()
+    with mock.patch.object(db.BaseDb, '_db_name', 'test.db'):
+        reader = db.Reader()
+    version = reader._cur.execute('PRAGMA user_version').fetchone()
+    err_msg = 'Проверьте, что BaseDb обновляет схему существующей БД'
+    assert version == (len(db._MIGRATIONS),), err_msg
+    orders = reader._cur.execute(
+        'SELECT id, ondate, isodate FROM currency_orders'
+    ).fetchall()
+    err_msg = 'Проверьте, что миграция удаляет дубликаты дат '
+    err_msg += 'и заполняет isodate'
+    assert orders == [(1, '12.12.2024', '2024-12-12')], err_msg
+    err_msg = 'Проверьте, что миграция удаляет дубликаты курсов'
+    assert len(reader.get_rates(test_date)) == 1, err_msg
+    err_msg = 'Проверьте, что курсы без даты не вносятся в БД'
+    with pytest.raises(sqlite3.IntegrityError):
+        reader._cur.execute(
+            "INSERT INTO currency_rates "
+            "VALUES (NULL, 'Доллар США', '840', 'USD', 1, '1')"
+        )
+    plan = reader._cur.execute(
+        '''EXPLAIN QUERY PLAN SELECT numeric_code FROM currency_rates
+           WHERE order_id=1'''
+    ).fetchall()
+    err_msg = 'Проверьте, что поиск курсов по order_id использует индекс'
+    assert 'idx_currency_rates_order_code' in str(plan), err_msg
+    reader.close()
+
+
+class StaleVersionConnection(sqlite3.Connection):
+    '''Подключение, первый раз читающее версию схемы до миграции.'''
+
+    stale = True
+
+    def execute(self, sql, *args):
+        if self.stale and sql == 'PRAGMA user_version':
+            self.stale = False
+            return super().execute('SELECT 0')
+        return super().execute(sql, *args)
+
+
+def test_migrate_concurrent(get_test_reader):
+    con = sqlite3.connect('test.db', factory=StaleVersionConnection)
+    db._migrate(con)
+    err_msg = 'Проверьте, что _migrate перечитывает версию схемы после '
+    err_msg += 'BEGIN IMMEDIATE и не применяет миграции повторно'
+    assert con.execute('PRAGMA user_version').fetchone() == (
+        len(db._MIGRATIONS),
+    ), err_msg
+    con.close()
+
+
+def test_shared_connection(get_test_inserter, get_test_reader):
+    err_msg = 'Проверьте, что объекты BaseDb используют общее подключение'
+    assert get_test_inserter._con is get_test_reader._con, err_msg
+    with (mock.patch.object(db.BaseDb, '_db_name', 'test.db'),
+          mock.patch.object(db, '_migrate') as mock_migrate):
+        db.Reader().close()
+    err_msg = 'Проверьте, что схема БД проверяется один раз на подключение'
+    assert not mock_migrate.called, err_msg
+    with db.close_manager():
+        pass
+    err_msg = 'Проверьте, что close_manager закрывает все подключения'
+    with pytest.raises(DbReadError):
+        get_test_reader.read(test_date)
+
+
+def test_connection_pragmas(get_test_reader):
+    con = get_test_reader._con
+    err_msg = 'Проверьте, что подключение к БД использует журнал WAL'
+    assert con.execute('PRAGMA journal_mode').fetchone() == ('wal',), err_msg
+    err_msg = 'Проверьте, что к подключению применяются настройки _pragmas'
+    assert con.execute('PRAGMA busy_timeout').fetchone() == (
+        db.SqliteBackend._pragmas['busy_timeout'],
+    ), err_msg
+    writer = sqlite3.connect('test.db')
+    writer.execute('BEGIN IMMEDIATE')
+    writer.execute(
+        "INSERT INTO currency_orders (ondate, isodate) VALUES ('1', '1')"
+    )
+    err_msg = 'Проверьте, что открытая транзакция записи не блокирует чтение'
+    assert get_test_reader.get_rates(test_date) == [], err_msg
+    writer.rollback()
+    writer.close()
+
+
+def test_get_rates_uses_rates_cache(get_test_inserter, get_test_reader):
+    get_test_inserter.insert_date()
+    get_test_inserter.insert_rates()
+    get_test_reader.get_rates(test_date, ['36'])
+    with mock.patch.object(get_test_reader, '_cur') as mock_cur:
+        rates = get_test_reader.get_rates(test_date, ['36'])
+    err_msg = 'Проверьте, что повторное чтение курсов не обращается к БД'
+    assert rates == test_items, err_msg
+    assert not mock_cur.execute.called, err_msg
+
+
+def test_read_range(get_test_reader):
+    with mock.patch.object(db.BaseDb, '_db_name', 'test.db'):
+        bulk = db.BulkInserter()
+    amd = CurrencyRate('Армянский драм', '51', 'AMD', 100, Decimal('26.25'))
+    bulk.insert({
+        '31.12.2024': test_items + [amd],
+        '01.01.2025': [amd],
+        '02.01.2025': test_items,
+    })
+    bulk.close()
+    rows = list(get_test_reader.iter_range('01.12.2024', '01.01.2025'))
+    err_msg = 'Проверьте, что iter_range возвращает курсы за диапазон дат, '
+    err_msg += 'упорядоченные по дате'
+    assert [(date, rate.numeric_code) for date, rate in rows] == [
+        ('31.12.2024', '36'), ('31.12.2024', '51'), ('01.01.2025', '51')
+    ], err_msg
+    dates, codes, matrix = get_test_reader.read_matrix(
+        '31.12.2024', '02.01.2025', ['51', '36']
+    )
+    err_msg = 'Проверьте, что read_matrix возвращает матрицу дата x валюта'
+    assert dates == ['31.12.2024', '01.01.2025', '02.01.2025'], err_msg
+    assert codes == ['51', '36'], err_msg
+    assert matrix == [
+        [Decimal('0.2625'), Decimal('65.8247')],
+        [Decimal('0.2625'), None],
+        [None, Decimal('65.8247')],
+    ], err_msg
+
+
+def test_latest_date(get_test_reader):
+    err_msg = 'Проверьте, что latest_date возвращает None для пустой БД'
+    assert get_test_reader.latest_date() is None, err_msg
+    with mock.patch.object(db.BaseDb, '_db_name', 'test.db'):
+        bulk = db.BulkInserter()
+    bulk.insert({'02.01.2025': test_items, '31.12.2024': test_items})
+    bulk.close()
+    err_msg = 'Проверьте, что latest_date возвращает последнюю по '
+    err_msg += 'календарю дату, за которую в БД есть курсы'
+    assert get_test_reader.latest_date() == '02.01.2025', err_msg
+    plan = str(get_test_reader._cur.execute(
+        'EXPLAIN QUERY PLAN ' + db._LATEST_DATE
+    ).fetchall())
+    err_msg = 'Проверьте, что latest_date просматривает индекс isodate '
+    err_msg += 'без сортировки всей таблицы'
+    assert 'idx_currency_orders_isodate' in plan, err_msg
+    assert 'TEMP B-TREE' not in plan, err_msg
+
+
+def test_backend_by_db_name():
+    err_msg = 'Проверьте, что путь к файлу выбирает хранилище SQLite'
+    assert isinstance(
+        db.connections.backend('test.db'), db.SqliteBackend
+    ), err_msg
+    err_msg = 'Проверьте, что неизвестная схема имени базы вызывает '
+    err_msg += 'DbCreationError'
+    with (mock.patch.object(db.BaseDb, '_db_name', 'mysql://host/db'),
+          pytest.raises(DbCreationError)):
+        db.Reader()
+    err_msg = 'Проверьте, что ошибки БД не наследуют от ошибок sqlite3'
+    assert not issubclass(DbError, sqlite3.Error), err_msg
+    db.connections.close_all()
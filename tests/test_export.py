@@ -0,0 +1,64 @@
+import csv
+import json
+from decimal import Decimal
+
+import pytest
+
+import db
+import export
+from models import CurrencyRate
+
+aud = CurrencyRate('Австралийский доллар', '36', 'AUD', 1, Decimal('65.8247'))
+amd = CurrencyRate('Армянский драм', '51', 'AMD', 100, Decimal('26.25'))
+
+
+@pytest.fixture(scope='function')
+def get_test_db(isolate_db):
+    bulk = db.BulkInserter()
+    bulk.insert({
+        '31.12.2024': [aud, amd],
+        '01.01.2025': [aud, amd],
+        '02.01.2025': [aud],
+    })
+    yield bulk
+    bulk.close()
+
+
+def test_export_csv(get_test_db, tmp_path):
+    path = str(tmp_path / 'rates.csv')
+    rows = export.export_rates(path, 'csv', chunk_size=2)
+    with open(path, encoding='utf-8', newline='') as f:
+        lines = list(csv.reader(f))
+    err_msg = 'Проверьте, что export_rates выгружает все курсы в CSV'
+    assert rows == 5, err_msg
+    assert lines[0] == list(export.FIELDS), err_msg
+    assert lines[1] == [
+        '2024-12-31', 'Австралийский доллар', '36', 'AUD', '1', '65.8247'
+    ], err_msg
+    assert len(lines) == 6, err_msg
+
+
+def test_export_jsonl_filters(get_test_db, tmp_path):
+    path = str(tmp_path / 'rates.jsonl')
+    rows = export.export_rates(
+        path, 'jsonl', '01.01.2025', '02.01.2025', ['51']
+    )
+    with open(path, encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    err_msg = 'Проверьте, что export_rates учитывает фильтры по датам и кодам'
+    assert rows == 1, err_msg
+    assert lines == [{
+        'date': '2025-01-01', 'name': 'Армянский драм',
+        'numeric_code': '51', 'alphabetic_code': 'AMD',
+        'scale': 100, 'rate': '26.25'
+    }], err_msg
+
+
+def test_export_parquet(get_test_db, tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'rates.parquet')
+    rows = export.export_rates(path, 'parquet', chunk_size=2)
+    table = parquet.read_table(path)
+    err_msg = 'Проверьте, что export_rates выгружает все курсы в Parquet'
+    assert rows == table.num_rows == 5, err_msg
+    assert table.column_names == list(export.FIELDS), err_msg
@@ -0,0 +1,42 @@
+import json
+import logging
+from unittest import mock
+
+import logs
+
+
+def test_timed(caplog):
+    with caplog.at_level(logging.INFO, logger='logs'):
+        with logs.timed('parse', date='14.12.2024'):
+            pass
+    record = caplog.records[-1]
+    err_msg = 'Проверьте, что timed пишет в лог этап и его длительность'
+    assert record.stage == 'parse', err_msg
+    assert record.duration_ms >= 0, err_msg
+    assert record.funcName == 'test_timed', err_msg
+    data = json.loads(logs.JsonFormatter().format(record))
+    err_msg = 'Проверьте, что JsonFormatter выводит поля stage, '
+    err_msg += 'duration_ms и дополнительные поля записи'
+    assert data['stage'] == 'parse', err_msg
+    assert data['date'] == '14.12.2024', err_msg
+    assert data['message'].startswith('Этап parse'), err_msg
+
+
+def test_queued():
+    try:
+        with (mock.patch.object(logs.stream_handler, 'handle') as stream,
+              mock.patch.object(logs.file_handler, 'handle') as file):
+            logs.configure(queued=True)
+            err_msg = 'Проверьте, что в режиме очереди у logger '
+            err_msg += 'единственный обработчик QueueHandler'
+            assert len(logs.logger.handlers) == 1, err_msg
+            logs.logger.info('Проверка %s', 'очереди')
+            logs.stop()
+        err_msg = 'Проверьте, что записи из очереди выводятся в stdout '
+        err_msg += 'и файл фоновым потоком'
+        assert stream.call_args.args[0].getMessage() == 'Проверка очереди', (
+            err_msg
+        )
+        assert file.call_count == 1, err_msg
+    finally:
+        logs.configure(queued=False)
@@ -0,0 +1,33 @@
+import logs
+from metrics import BUCKETS, Metrics, metrics
+
+
+def test_stage_histogram():
+    with logs.timed('parse'):
+        pass
+    metrics.observe('parse', 100.0)
+    stages = metrics.snapshot()['stages']
+    err_msg = 'Проверьте, что длительности этапов из logs.timed '
+    err_msg += 'попадают в гистограмму этапа'
+    assert stages['parse']['count'] == 2, err_msg
+    assert stages['parse']['buckets'][0] == 1, err_msg
+    assert stages['parse']['buckets'][len(BUCKETS)] == 1, err_msg
+
+
+def test_report_and_prometheus():
+    registry = Metrics()
+    registry.inc('rows_written', 5)
+    registry.observe('insert', 0.003)
+    report = registry.report()
+    err_msg = 'Проверьте, что отчет содержит этапы и счетчики'
+    assert 'insert' in report and 'rows_written' in report, err_msg
+    text = registry.prometheus()
+    err_msg = 'Проверьте, что гистограмма в формате Prometheus '
+    err_msg += 'накопительная и заканчивается корзиной +Inf'
+    assert 'cbr_rows_written_total 5' in text, err_msg
+    assert 'cbr_stage_duration_seconds_bucket{stage="insert",le="0.0025"} 0' \
+        in text, err_msg
+    assert 'cbr_stage_duration_seconds_bucket{stage="insert",le="0.005"} 1' \
+        in text, err_msg
+    assert 'cbr_stage_duration_seconds_bucket{stage="insert",le="+Inf"} 1' \
+        in text, err_msg
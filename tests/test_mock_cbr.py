@@ -0,0 +1,71 @@
+import threading
+from unittest import mock
+
+import pytest
+
+import api
+from exceptions import RequestError
+import mock_cbr
+
+pytestmark = pytest.mark.usefixtures('isolate_api')
+
+date = '14.12.2024'
+
+
+def start(**options):
+    httpd = mock_cbr.make_server(seed=1, **options)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def run(**options):
+        httpd = start(**options)
+        servers.append(httpd)
+        return mock.patch.object(
+            api.ApiGetAndParse, '_url', mock_cbr.server_url(httpd)
+        )
+
+    yield run
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_curs_on_date(server):
+    with server():
+        rates = api.ApiGetAndParse(date, use_cache=False).parse_rates_data()
+        latest = api.ApiGetAndParse.get_latest_date()
+    err_msg = 'Проверьте, что mock_cbr отвечает записанными курсами '
+    err_msg += 'на GetCursOnDateXML'
+    assert len(rates) == 43, err_msg
+    assert rates[0].name == 'Австралийский доллар', err_msg
+    err_msg = 'Проверьте, что mock_cbr отвечает на GetLatestDateTime'
+    assert latest, err_msg
+
+
+def test_response_size_and_dynamics(server):
+    with server(valutes=500):
+        rates = api.ApiGetAndParse(date, use_cache=False).parse_rates_data()
+        history = api.get_required_currencies_on_dates(
+            ['09.12.2024', '10.12.2024', '11.12.2024'], ['7']
+        )
+    err_msg = 'Проверьте, что размер ответа задается параметром valutes'
+    assert len(rates) == 500, err_msg
+    err_msg = 'Проверьте, что mock_cbr отвечает на GetCursDynamicXML'
+    assert list(history) == ['09.12.2024', '10.12.2024', '11.12.2024'], (
+        err_msg
+    )
+
+
+def test_errors_and_latency(server):
+    with server(error_rate=1.0), pytest.raises(RequestError):
+        api.ApiGetAndParse(date, use_cache=False).get_rates_data()
+    with (server(latency=0.5),
+          mock.patch.object(api.ApiGetAndParse, '_timeout', (1, 0.05)),
+          mock.patch.object(api.ApiGetAndParse, '_retries', 0),
+          pytest.raises(RequestError)):
+        api.ApiGetAndParse(date, use_cache=False).get_rates_data()
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+import pytest
+
+import db
+import pipeline
+
+pytestmark = pytest.mark.usefixtures('isolate_api', 'isolate_db')
+
+
+def test_backfill():
+    with open('tests/example_response.txt', 'r', encoding='utf-8') as f:
+        example_text = f.read()
+    dates = ['10.12.2024', '11.12.2024', '12.12.2024']
+    with patch('requests.Session.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = example_text
+        inserted = pipeline.backfill(dates, processes=2, batch_dates=2)
+        err_msg = 'Проверьте, что backfill вносит курсы всех валют '
+        err_msg += 'за каждую дату'
+        assert inserted == 3 * 43, err_msg
+        inserted = pipeline.backfill(
+            ['13.12.2024'], ['36', '978'], processes=1
+        )
+    err_msg = 'Проверьте, что backfill вносит только курсы заданных валют'
+    assert inserted == 2, err_msg
+    reader = db.Reader()
+    rates = reader.get_rates('12.12.2024', ['36'])
+    reader.close()
+    err_msg = 'Проверьте, что курсы, разобранные в процессах пула, '
+    err_msg += 'внесены в БД без потери точности'
+    assert str(rates[0].rate) == '65.8542', err_msg
+
+
+def test_backfill_window():
+    with open('tests/example_response.txt', 'r', encoding='utf-8') as f:
+        example_text = f.read()
+    dates = [f'{day:02}.11.2024' for day in range(1, 21)]
+    with (patch('requests.Session.post') as mock_post,
+          patch.object(pipeline, 'wait', wraps=pipeline.wait) as mock_wait):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = example_text
+        inserted = pipeline.backfill(
+            dates, ['36'], processes=1, fetch_workers=1
+        )
+    err_msg = 'Проверьте, что backfill вносит курсы за все даты'
+    assert inserted == len(dates), err_msg
+    err_msg = 'Проверьте, что одновременно запрашивается и разбирается '
+    err_msg += 'ограниченное число дат'
+    assert max(len(call.args[0]) for call in mock_wait.call_args_list) <= (
+        2 * (1 + 1)
+    ), err_msg
@@ -0,0 +1,99 @@
+import os
+from decimal import Decimal
+from unittest import mock
+
+import pytest
+
+import db
+from models import CurrencyRate
+
+postgres = pytest.importorskip('postgres')
+
+test_rows = [
+    (1, 'Австралийский доллар', '36', 'AUD', 1, '65.8247'),
+    (1, 'Евро', '978', 'EUR', 1, '106.1028'),
+]
+
+
+def test_backend_by_url():
+    url = 'postgresql://user@localhost/rates'
+    backend = db.connections.backend(url)
+    err_msg = 'Проверьте, что имя базы postgresql:// выбирает PostgresBackend'
+    assert isinstance(backend, postgres.PostgresBackend), err_msg
+    err_msg = 'Проверьте, что хранилище не подключается до первого запроса'
+    assert backend._pool is None, err_msg
+    db.connections.close_all()
+
+
+def test_insert_rates_uses_copy():
+    cur = mock.MagicMock(rowcount=len(test_rows))
+    copy = cur.copy.return_value.__enter__.return_value
+    inserted = postgres.PostgresBackend('postgresql://').insert_rates(
+        cur, test_rows
+    )
+    err_msg = 'Проверьте, что PostgresBackend вносит курсы командой COPY'
+    assert 'COPY currency_rates_stage' in cur.copy.call_args.args[0], err_msg
+    assert copy.write_row.call_args_list == [
+        mock.call(row) for row in test_rows
+    ], err_msg
+    err_msg = 'Проверьте, что курсы, уже внесенные другим хостом, '
+    err_msg += 'пропускаются'
+    assert 'ON CONFLICT DO NOTHING' in cur.execute.call_args.args[0], err_msg
+    assert inserted == len(test_rows), err_msg
+
+
+def test_range_reads_use_server_cursor():
+    backend = postgres.PostgresBackend('postgresql://')
+    reader = object.__new__(db.Reader)
+    reader._backend = backend
+    reader._errors = backend.errors
+    reader._con = mock.MagicMock()
+    with mock.patch.object(postgres, 'QmarkServerCursor') as server_cursor:
+        server_cursor.return_value.fetchmany.side_effect = [
+            [('2024-12-12',) + test_rows[0][1:]], []
+        ]
+        chunks = list(reader.iter_chunks('01.12.2024', '31.12.2024'))
+    err_msg = 'Проверьте, что на PostgreSQL выгрузка диапазона дат '
+    err_msg += 'читается именованным серверным курсором в транзакции'
+    assert server_cursor.call_args.args[0] is reader._con, err_msg
+    assert server_cursor.call_args.args[1].startswith('cbr_range_'), err_msg
+    assert reader._con.transaction.return_value.__enter__.called, err_msg
+    assert not reader._con.execute.called, err_msg
+    assert chunks == [[('2024-12-12',) + test_rows[0][1:]]], err_msg
+    err_msg = 'Проверьте, что серверный курсор закрывается после чтения'
+    assert server_cursor.return_value.close.called, err_msg
+
+
+@pytest.fixture
+def postgres_url():
+    url = os.environ.get('CBR_TEST_POSTGRES_URL')
+    if url is None:
+        pytest.skip('не задана переменная CBR_TEST_POSTGRES_URL')
+    yield url
+    db.connections.close_all()
+    with postgres.psycopg.connect(url, autocommit=True) as con:
+        con.execute(
+            'DROP TABLE IF EXISTS currency_rates, currency_orders, '
+            'schema_version'
+        )
+
+
+def test_postgres_round_trip(postgres_url):
+    rate = CurrencyRate('Евро', '978', 'EUR', 1, Decimal('106.1028'))
+    with mock.patch.object(db.BaseDb, '_db_name', postgres_url):
+        bulk = db.BulkInserter()
+        reader = db.Reader()
+    err_msg = 'Проверьте, что BulkInserter вносит курсы в PostgreSQL'
+    assert bulk.insert({'12.12.2024': [rate]}) == 1, err_msg
+    err_msg = 'Проверьте, что BulkInserter не вносит дубликаты курсов'
+    assert bulk.insert({'12.12.2024': [rate]}) == 0, err_msg
+    err_msg = 'Проверьте, что Reader читает курсы из PostgreSQL'
+    assert reader.get_rates('12.12.2024') == [rate], err_msg
+    assert list(reader.iter_range('01.12.2024', '31.12.2024')) == [
+        ('12.12.2024', rate)
+    ], err_msg
+    assert list(reader.iter_chunks(chunk_size=1)) == [
+        [('2024-12-12', 'Евро', '978', 'EUR', 1, '106.1028')]
+    ], err_msg
+    bulk.close()
+    reader.close()
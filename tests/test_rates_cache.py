@@ -0,0 +1,46 @@
+from decimal import Decimal
+from unittest import mock
+
+from models import CurrencyRate
+from rates_cache import RatesCache
+
+aud = CurrencyRate('Австралийский доллар', '36', 'AUD', 1, Decimal('65.8542'))
+eur = CurrencyRate('Евро', '978', 'EUR', 1, Decimal('109.0126'))
+
+
+def test_get_partial_and_complete_tables():
+    cache = RatesCache()
+    cache.put('14.12.2024', [aud])
+    err_msg = 'Проверьте, что неполная таблица отвечает только на запросы '
+    err_msg += 'кодов, которые в ней есть'
+    assert cache.get('14.12.2024', ['36']) == {'36': aud}, err_msg
+    assert cache.get('14.12.2024', ['36', '978']) is None, err_msg
+    assert cache.get('14.12.2024') is None, err_msg
+    cache.put('14.12.2024', [eur], complete=True)
+    err_msg = 'Проверьте, что полная таблица отвечает на любые запросы'
+    assert cache.get('14.12.2024', ['000']) == {
+        '36': aud, '978': eur
+    }, err_msg
+    err_msg = 'Проверьте, что кэш считает попадания и промахи'
+    assert cache.stats() == {'hits': 2, 'misses': 2, 'size': 1}, err_msg
+
+
+def test_eviction():
+    cache = RatesCache(maxsize=2)
+    cache.put('12.12.2024', [aud])
+    cache.put('13.12.2024', [aud])
+    cache.get('12.12.2024', ['36'])
+    cache.put('14.12.2024', [aud])
+    err_msg = 'Проверьте, что удаляется таблица, к которой дольше всего '
+    err_msg += 'не обращались'
+    assert cache.get('13.12.2024', ['36']) is None, err_msg
+    assert cache.get('12.12.2024', ['36']) is not None, err_msg
+    cache = RatesCache(ttl=60)
+    with mock.patch('time.monotonic', return_value=0):
+        cache.put('12.12.2024', [aud])
+    with mock.patch('time.monotonic', return_value=50):
+        cache.put('12.12.2024', [])
+    with mock.patch('time.monotonic', return_value=61):
+        err_msg = 'Проверьте, что устаревшие таблицы не возвращаются, '
+        err_msg += 'даже если их дополняли'
+        assert cache.get('12.12.2024', ['36']) is None, err_msg
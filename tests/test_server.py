@@ -0,0 +1,85 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+import db
+from exceptions import DbReadError
+import server
+
+
+@pytest.fixture(scope='function')
+def get_test_server(isolate_api, isolate_db):
+    httpd = server.make_server('127.0.0.1', 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get_json(url: str) -> tuple[int, dict]:
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def test_rates(get_test_server):
+    with open('tests/example_response.txt', 'r', encoding='utf-8') as f:
+        example_text = f.read()
+    url = f'{get_test_server}/rates?date=14.12.2024&codes=36,978,000'
+    with patch('requests.Session.post') as mock_post:
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = example_text
+        status, body = get_json(url)
+        err_msg = 'Проверьте, что /rates возвращает курсы запрошенных валют'
+        assert status == 200, err_msg
+        assert [i['numeric_code'] for i in body['rates']] == [
+            '36', '978'
+        ], err_msg
+        assert body['rates'][0]['rate'] == '65.8542', err_msg
+        assert body['not_found'] == ['000'], err_msg
+        status, body = get_json(
+            f'{get_test_server}/rates?date=14.12.2024&codes=978'
+        )
+        err_msg = 'Проверьте, что повторный запрос не обращается к API'
+        assert status == 200, err_msg
+        assert mock_post.call_count == 1, err_msg
+    with urllib.request.urlopen(f'{get_test_server}/metrics') as response:
+        text = response.read().decode('utf-8')
+    err_msg = 'Проверьте, что /metrics возвращает счетчики и гистограммы '
+    err_msg += 'в формате Prometheus'
+    assert 'cbr_http_requests_total 1' in text, err_msg
+    assert 'cbr_rows_written_total 2' in text, err_msg
+    assert 'cbr_stage_duration_seconds_count{stage="fetch"} 1' in text, (
+        err_msg
+    )
+
+
+def test_rates_bad_input(get_test_server):
+    status, body = get_json(f'{get_test_server}/rates?date=bad&codes=36')
+    err_msg = 'Проверьте, что при неверной дате сервер отвечает кодом 400'
+    assert status == 400, err_msg
+    assert 'Дата введена неверно' in body['error'], err_msg
+    status, _ = get_json(f'{get_test_server}/rates?date=14.12.2024')
+    err_msg = 'Проверьте, что без списка кодов сервер отвечает кодом 400'
+    assert status == 400, err_msg
+
+
+def test_rates_server_errors(get_test_server):
+    url = f'{get_test_server}/rates?date=14.12.2024&codes=36'
+    with patch.object(db.Reader, 'get_rates', side_effect=DbReadError):
+        status, body = get_json(url)
+    err_msg = 'Проверьте, что при ошибке БД сервер отвечает кодом 500'
+    assert status == 500, err_msg
+    assert 'Ошибка чтения данных из БД' in body['error'], err_msg
+    with patch.object(db.Reader, 'get_rates', side_effect=KeyError):
+        status, _ = get_json(url)
+    err_msg = 'Проверьте, что при непредвиденной ошибке сервер отвечает '
+    err_msg += 'кодом 500, а не 400'
+    assert status == 500, err_msg
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('requests', 'prettytable', 'api', 'server', 'export')
+
+
+def run_python(code):
+    return subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+
+
+def import_time_us(stderr, module):
+    for line in stderr.splitlines():
+        if line.rpartition('|')[2].strip() == module:
+            return int(line.split('|')[1])
+    return None
+
+
+def test_logs_does_not_import_main():
+    result = run_python('import sys, logs; print("main" in sys.modules)')
+    err_msg = 'Проверьте, что настройка логов не импортирует main'
+    assert result.stdout.strip() == 'False', err_msg
+
+
+def test_main_import_time():
+    result = run_python(
+        'import sys, main\n'
+        'sys.argv = ["main.py"]\n'
+        'main.main()\n'
+        f'print([m for m in {HEAVY!r} if m in sys.modules])'
+    )
+    err_msg = 'Проверьте, что при запуске без аргументов не импортируются '
+    err_msg += 'requests, prettytable и модули режимов'
+    assert result.stdout.strip().splitlines()[-1] == '[]', err_msg
+    main_us = import_time_us(result.stderr, 'main')
+    err_msg = 'Проверьте, что импорт main занимает меньше 0,5 с'
+    assert main_us is not None and main_us < 500_000, err_msg
@@ -91,3 +91,32 @@ def test_validate_codes():
     v_codes = validation.validate_codes(good_codes)
     err_msg = 'Проверьте, что выбираются все корректные коды'
     assert v_codes == ['123', '36', '24'], err_msg
+
+
+def test_validate_dates():
+    timedelta = datetime.timedelta(days=1)
+    late_date = (datetime.datetime.now() + timedelta).strftime('%d.%m.%Y')
+    v_dates = validation.validate_dates('12.12.2024')
+    err_msg = 'Проверьте, что одиночная дата возвращается списком'
+    assert v_dates == ['12.12.2024'], err_msg
+    v_dates = validation.validate_dates('30.12.2024-02.01.2025')
+    err_msg = 'Проверьте, что диапазон раскрывается во все даты включительно'
+    assert v_dates == [
+        '30.12.2024', '31.12.2024', '01.01.2025', '02.01.2025'
+    ], err_msg
+    with pytest.raises(exceptions.DateRangeError):
+        validation.validate_dates('02.01.2025-30.12.2024')
+    with pytest.raises(exceptions.DateInputError):
+        validation.validate_dates('30.12.2024-bad_date')
+    with pytest.raises(exceptions.DateOutOfRangeError):
+        validation.validate_dates(f'30.12.2024-{late_date}')
+
+
+def test_validate_export_path():
+    formats = {'.csv': 'csv', '.jsonl': 'jsonl'}
+    err_msg = 'Проверьте, что формат выгрузки определяется по расширению'
+    assert validation.validate_export_path(
+        'out/Rates.CSV', formats
+    ) == 'csv', err_msg
+    with pytest.raises(exceptions.ExportFormatError):
+        validation.validate_export_path('rates.txt', formats)
@@ -1,11 +1,15 @@
 import datetime
+import os
 import re
 import sys
 
 from exceptions import (AdditionalArgumentsError,
                         DateInputError,
                         DateOutOfRangeError,
-                        InputError,)
+                        DateRangeError,
+                        ExportFormatError,
+                        InputError,
+                        PortInputError,)
 import logs
 
 
@@ -31,6 +35,24 @@ def validate_input() -> bool:
     return True
 
 
+def pop_flag(flag: str) -> bool:
+    '''
+    Проверяет, указан ли флаг среди аргументов командной строки,
+    и убирает его из sys.argv.
+
+    Аргументы:
+        flag: флаг вида --name.
+
+    Возвращает:
+        True, если флаг был указан.
+    '''
+
+    if flag not in sys.argv:
+        return False
+    sys.argv.remove(flag)
+    return True
+
+
 def validate_date(input: str) -> str:
     '''
     Проверяет правильность ввода даты.
@@ -50,14 +72,46 @@ def validate_date(input: str) -> str:
         current_date = datetime.datetime.now()
         input_date = datetime.datetime.strptime(input, '%d.%m.%Y')
     except Exception:
-        logs.logger.error(f'Дата введена неверно: {input}')
+        logs.logger.error('Дата введена неверно: %s', input)
         raise DateInputError
     if input_date > current_date:
-        logs.logger.error(f'Введенная дата больше текущей: {input_date}')
+        logs.logger.error('Введенная дата больше текущей: %s', input_date)
         raise DateOutOfRangeError
     return input_date.strftime('%d.%m.%Y')
 
 
+def validate_dates(input: str) -> list[str]:
+    '''
+    Проверяет правильность ввода даты или диапазона дат.
+    Логирует факт неправильного ввода.
+
+    Необходимый формат ввода: ДД.ММ.ГГГГ или ДД.ММ.ГГГГ-ДД.ММ.ГГГГ.
+
+    Возвращает:
+        Список всех дат диапазона, включая начальную и конечную,
+        в формате ДД.ММ.ГГГГ.
+
+    Исключения:
+        DateInputError: вызывается, если формат одной из дат не
+            соответствует ДД.ММ.ГГГГ.
+        DateOutOfRangeError: вызывается, если одна из дат больше текущей.
+        DateRangeError: вызывается, если начальная дата больше конечной.
+    '''
+
+    if '-' not in input:
+        return [validate_date(input)]
+    start, _, end = input.partition('-')
+    start_date = datetime.datetime.strptime(validate_date(start), '%d.%m.%Y')
+    end_date = datetime.datetime.strptime(validate_date(end), '%d.%m.%Y')
+    if start_date > end_date:
+        logs.logger.error('Начальная дата больше конечной: %s', input)
+        raise DateRangeError
+    return [
+        (start_date + datetime.timedelta(days=i)).strftime('%d.%m.%Y')
+        for i in range((end_date - start_date).days + 1)
+    ]
+
+
 def validate_codes(input: list[str]) -> list[str] | bool:
     '''
     Проверяет правильность ввода кодов валют.
@@ -75,7 +129,7 @@ def validate_codes(input: list[str]) -> list[str] | bool:
     '''
 
     if len(input) > 1:
-        logs.logger.error(f'В списке кодов присутствуют пробелы: {input}')
+        logs.logger.error('В списке кодов присутствуют пробелы: %s', input)
         raise AdditionalArgumentsError
     code_list = input[0].split(',')
     digits = re.compile(r'\D+')
@@ -92,3 +146,46 @@ def validate_codes(input: list[str]) -> list[str] | bool:
         logs.logger.warning('В запросе не найдено кодов необходимого формата.')
         return False
     return good_codes
+
+
+def validate_port(input: str) -> int:
+    '''
+    Проверяет правильность ввода номера порта сервера.
+    Логирует факт неправильного ввода.
+
+    Возвращает:
+        Номер порта.
+
+    Исключения:
+        PortInputError: вызывается, если порт не является числом
+        от 1 до 65535.
+    '''
+
+    if not input.isdigit() or not 0 < int(input) < 65536:
+        logs.logger.error('Порт введен неверно: %s', input)
+        raise PortInputError
+    return int(input)
+
+
+def validate_export_path(input: str, formats: dict[str, str]) -> str:
+    '''
+    Проверяет, что расширение файла выгрузки соответствует одному
+    из поддерживаемых форматов.
+    Логирует факт неправильного ввода.
+
+    Аргументы:
+        input: путь к файлу.
+        formats: словарь, где ключ - расширение, значение - формат.
+
+    Возвращает:
+        Формат файла.
+
+    Исключения:
+        ExportFormatError: вызывается, если расширение не поддерживается.
+    '''
+
+    extension = os.path.splitext(input)[1].lower()
+    if extension not in formats:
+        logs.logger.error('Неподдерживаемый формат файла: %s', input)
+        raise ExportFormatError
+    return formats[extension]